@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    LLM answers keyed by (model, prompt variant, retrieved chunk ids).
+
+    Within one key, a cached answer is returned when the new question's
+    embedding has cosine similarity >= threshold with the one it was
+    generated for, so rephrasings that retrieve exactly the same context
+    are answered without calling the LLM again.
+
+    Entries belong to one index generation: looking up with a different
+    generation drops everything (vector ids are only meaningful within a
+    generation).
+    """
+
+    def __init__(self, max_entries=512, ttl=24 * 3600, threshold=0.95, per_key=8):
+        self.max_entries = max_entries
+        self.ttl = ttl  # seconds, None = never expire
+        self.threshold = threshold
+        self.per_key = per_key  # question variants kept per key
+
+        self._entries = OrderedDict()  # key -> [(vector, answer, stored_at, gen_seconds)]
+        self._size = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(model, chunk_ids, variant=""):
+        return (model, variant, tuple(int(i) for i in chunk_ids))
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._size = 0
+            self._generation = generation
+
+    # LOOKUP
+    def get(self, model, generation, chunk_ids, query_vector, variant=""):
+        """Cached answer for this context and a close enough question, else None."""
+        key = self.make_key(model, chunk_ids, variant)
+        query = np.asarray(query_vector, dtype="float32").reshape(-1)
+
+        with self._lock:
+            self._check_generation(generation)
+
+            entries = self._entries.get(key)
+            if entries:
+                live = [e for e in entries if not self._expired(e[2])]
+                self._size -= len(entries) - len(live)
+                if live:
+                    self._entries[key] = live
+                    self._entries.move_to_end(key)
+                    similarities = np.stack([e[0] for e in live]) @ query
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.threshold:
+                        self.hits += 1
+                        self.saved_seconds += live[best][3]
+                        return live[best][1]
+                else:
+                    del self._entries[key]
+
+            self.misses += 1
+            return None
+
+    # STORE
+    def put(self, model, generation, chunk_ids, query_vector, answer, variant="", seconds=0.0):
+        """seconds: how long the answer took to generate (reported as saved on hits)."""
+        key = self.make_key(model, chunk_ids, variant)
+        vector = np.asarray(query_vector, dtype="float32").reshape(-1)
+
+        with self._lock:
+            self._check_generation(generation)
+
+            entries = self._entries.setdefault(key, [])
+            entries.append((vector, answer, time.time(), seconds))
+            self._size += 1
+            if len(entries) > self.per_key:
+                entries.pop(0)
+                self._size -= 1
+            self._entries.move_to_end(key)
+
+            # Least recently used keys go first
+            while self._size > self.max_entries:
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped)
+                self.evictions += len(dropped)
+
+    # STATS
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
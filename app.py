@@ -1,7 +1,13 @@
-from flask import Flask, render_template, request, jsonify
-import subprocess
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import jinja2
-from app_ui import Qurey_handlder, import_and_process_files
+import json
+import time
+from collections import deque
+from app_ui import Qurey_handlder, stream_query_handler, import_and_process_files, answer_cache
+from model_catalog import get_catalog
+from ollama_client import get_client
+from single_flight import SingleFlight
+from vector_database import resident_stats
 app = Flask(__name__)
 
 answer_streaming = False
@@ -13,24 +19,16 @@ Ai_name = f"{project_Version} 3.0 - {sel_model}"
 rag_mode_lbl = "RAG Mode"
 streaming_mode_lbl = "Streaming"
 
-# ---------------- OLLAMA MODELS ----------------
-def get_local_models():
-    try:
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True
-        )
-        lines = result.stdout.strip().split("\n")[1:]
-        model_list = [line.split()[0] for line in lines]
+# Timing of recent /ask/stream answers (ttft_s, tokens_per_s, ...)
+stream_stats = deque(maxlen=200)
 
-        if "bge-m3:latest" in model_list:
-            model_list.remove("bge-m3:latest")
+# In-flight deduplication of identical /ask and /ask/stream requests
+flights = SingleFlight()
 
-        return model_list
-    except Exception as e:
-        print("Error fetching models:", e)
-        return []
+# ---------------- OLLAMA MODELS ----------------
+def get_local_models():
+    # Cached /api/tags listing; embedding-only models such as bge-m3 are left out
+    return get_catalog().chat_models()
 
 
 
@@ -55,8 +53,9 @@ def ask():
     print("RAG:", rag_model)
     print("Streaming:", answer_streaming)
 
-    # TEMP RESPONSE (replace later with Qurey_handlder)
-    answer = Qurey_handlder(query, sel_model, rag_model, answer_streaming)
+    # Identical questions arriving together share one retrieval and generation
+    key = ("ask", (query or "").strip(), sel_model, bool(rag_model), bool(answer_streaming))
+    answer = flights.do(key, Qurey_handlder, query, sel_model, rag_model, answer_streaming)
     print("Answer:", answer)
 
     if rag_model == True:
@@ -71,5 +70,68 @@ def ask():
         })
 
 
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_stream():
+    """
+    Server-sent events: "token" per generated chunk, "sources" for RAG
+    answers, then "done" with timing, or "error".
+    """
+    data = request.json
+
+    query = data.get("query")
+    sel_model = data.get("model")
+    rag_model = data.get("rag")
+    Ai_name = f"{project_Version} - {sel_model}"
+    received = time.perf_counter()
+
+    # Concurrent identical questions subscribe to one token stream
+    key = ("stream", (query or "").strip(), sel_model, bool(rag_model))
+
+    def generate():
+        yield sse("meta", {"ai_name": Ai_name})
+        first_token = None
+        try:
+            events = flights.stream(key, lambda: stream_query_handler(query, sel_model, rag_model))
+            for event in events:
+                kind = event.pop("type")
+                if kind == "token" and first_token is None:
+                    first_token = time.perf_counter()
+                if kind == "done":
+                    # Time to first token as the user sees it: retrieval included
+                    event["llm_ttft_s"] = event["ttft_s"]
+                    event["ttft_s"] = round((first_token or time.perf_counter()) - received, 3)
+                    stream_stats.append({k: v for k, v in event.items() if k != "answer"})
+                    if event.get("cached"):
+                        print(f"⏱️ TTFT {event['ttft_s']}s (cached answer)")
+                    else:
+                        print(f"⏱️ TTFT {event['ttft_s']}s, {event['tokens_per_s']} tokens/s, "
+                              f"{event['tokens']} tokens in {event['total_s']}s")
+                yield sse(kind, event)
+        except Exception as e:
+            print("Streaming error:", e)
+            yield sse("error", {"message": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/stats")
+def stats():
+    return jsonify({
+        "answer_cache": answer_cache.stats(),
+        "single_flight": flights.stats(),
+        "ollama": get_client().metrics(),
+        "vector_stores": resident_stats(),
+        "recent_streams": list(stream_stats)[-20:]
+    })
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,11 +1,13 @@
-import subprocess
+import os
+import time
 from pathlib import Path
 from media_audio_extractor import name_list, format_converter
 from text_chunker import WhisperTranscriber
-from vector_database import BGEVectorStore
+from vector_database import BGEVectorStore, open_vector_store_for_ingest
 from rag_answer import ask_llm_with_context
-from rag_answer_streaming import ask_llm_with_context_streaming
-from llm_answer import ask_local_llm
+from rag_answer_streaming import ask_llm_with_context_streaming, stream_llm_with_context
+from llm_answer import ask_local_llm, stream_local_llm
+from answer_cache import SemanticAnswerCache
 
 
 
@@ -17,81 +19,105 @@ AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
 db = BGEVectorStore(index_path="src/vector_db")
 
+# RAG answers, reused for rephrased questions that retrieve the same passages
+answer_cache = SemanticAnswerCache()
 
 
-def get_local_models():
-    try:
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True
-        )
-        lines = result.stdout.strip().split("\n")[1:]
-        return [line.split()[0] for line in lines]
-    except Exception:
-        return []
 
-def video_to_mp3():
+def video_to_audio():
+    # 16 kHz mono WAV; unchanged videos are skipped on reruns. Videos can
+    # also be ingested directly: batched transcription pipes them from ffmpeg
     available_files = [f for f in VIDEO_DIR.iterdir() if f.is_file()]
     file_map = name_list(available_files)
-    format_converter(file_map, VIDEO_DIR, AUDIO_DIR, "mp3")
+    return format_converter(file_map, VIDEO_DIR, AUDIO_DIR, "wav")
 
 
-def text_chunking(path):
-    transcriber = WhisperTranscriber()
-    chunks = transcriber.ingest(path)
-    print(chunks)
-    return chunks
+def text_chunking(path, skip_file=None, transcriber=None):
+    transcriber = transcriber or WhisperTranscriber()
+    # Generator: records arrive file by file while embedding is running;
+    # text documents are parsed on every core
+    return transcriber.ingest(path, skip_file=skip_file, workers=os.cpu_count())
 
 
-def text_to_Embeddings(chunks):
-    vector_db = BGEVectorStore(model_name="bge-m3", dim=1024, index_path="src/vector_db")
+def text_to_Embeddings(chunks, vector_db=None, failed_files=()):
+    # Appends to the existing index instead of rebuilding it
+    if vector_db is None:
+        vector_db = open_vector_store_for_ingest(index_path="src/vector_db")
     vector_db.add_documents(chunks, batch_size=32)
+
+    # A file that failed part-way must be parsed again next time
+    for source_path in failed_files:
+        vector_db.file_manifest.pop(source_path, None)
+
     vector_db.save()
 
     print("✅ Vector database saved")
 
 
 def import_and_process_files(path):
-    split_data = text_chunking(path)
-    text_to_Embeddings(split_data)
+    vector_db = open_vector_store_for_ingest(index_path="src/vector_db")
+    transcriber = WhisperTranscriber()
+    split_data = text_chunking(path, skip_file=vector_db.is_unchanged, transcriber=transcriber)
+    text_to_Embeddings(split_data, vector_db, failed_files=transcriber.failed_files)
 
 
 #  RUN 
-def Qurey_handlder(user_query, sel_model, rag_model, answer_streaming):
-
+def retrieve_matches(user_query):
     matches = db.search_vector_db(
         query=user_query,
         top_k=5,
         score_threshold=0.35
     )
 
-    # Remove useless short chunks
-    matches = [
-        r for r in matches
-        if len(r["embedding_text"].split()) >= 6
-    ]
+    # Paragraph/context text is only looked up for the passages we send
+    db.resolve_texts(matches)
+    return matches
+
+
+def answer_cache_key(user_query, matches):
+    """(index generation, retrieved vector ids, query embedding) for answer_cache."""
+    store = db.resident()
+    # The query embedding is already in the embedding cache from the search
+    return store.signature, [r["vector_id"] for r in matches], store.embed_query(user_query)
+
+
+def Qurey_handlder(user_query, sel_model, rag_model, answer_streaming):
 
     if rag_model == True:
+        matches = retrieve_matches(user_query)
         if not matches:
             print("❌ No relevant data found")
         else:
-            if answer_streaming == True:
-                # answer = ask_llm_with_context_streaming(
-                #     user_query=user_query,
-                #     matches=matches,
-                #     llm_model=sel_model
-                # )
-                # return answer
+            key = answer_cache_key(user_query, matches)
 
-                return "The streaming this feature is currently unavailable!\n Please continue with stream option off until we fix issue in next update!"
+            if answer_streaming == True:
+                cached = answer_cache.get(sel_model, *key, variant="rag_stream")
+                if cached is not None:
+                    return cached["answer"]
 
-            else:
-                answer = ask_llm_with_context(
+                start = time.perf_counter()
+                answer = ask_llm_with_context_streaming(
                     user_query=user_query,
                     matches=matches,
-                    llm_model=sel_model
+                    llm_model=sel_model,
+                    text_of=db.paragraph_text
                 )
+                answer_cache.put(sel_model, *key, answer, variant="rag_stream",
+                                 seconds=time.perf_counter() - start)
+                return answer["answer"]
+
+            else:
+                answer = answer_cache.get(sel_model, *key, variant="rag")
+                if answer is None:
+                    start = time.perf_counter()
+                    answer = ask_llm_with_context(
+                        user_query=user_query,
+                        matches=matches,
+                        llm_model=sel_model,
+                        text_of=db.paragraph_text
+                    )
+                    answer_cache.put(sel_model, *key, answer, variant="rag",
+                                     seconds=time.perf_counter() - start)
             return answer
     else:
         answer = ask_local_llm(
@@ -100,6 +126,40 @@ def Qurey_handlder(user_query, sel_model, rag_model, answer_streaming):
             streaming=answer_streaming
         )
         return answer
-        # print("\n🧠 Final Answer:\n")
-        # # print("\n📊 Confidence Score:", answer["confidence"], "%")
-        # print(answer)
\ No newline at end of file
+
+
+def stream_query_handler(user_query, sel_model, rag_model):
+    """
+    Same as Qurey_handlder, as events (see llm_answer.stream_generate) for
+    the /ask/stream endpoint.
+    """
+    if rag_model == True:
+        matches = retrieve_matches(user_query)
+        if not matches:
+            yield {"type": "token", "token": "❌ No relevant data found"}
+            return
+
+        key = answer_cache_key(user_query, matches)
+        cached = answer_cache.get(sel_model, *key, variant="rag_stream")
+        if cached is not None:
+            yield {"type": "sources", "sources": cached["sources"], "confidence": cached["confidence"]}
+            yield {"type": "token", "token": cached["answer"]}
+            yield {"type": "done", "answer": cached["answer"], "ttft_s": 0.0, "tokens": 0,
+                   "tokens_per_s": 0.0, "total_s": 0.0, "cached": True}
+            return
+
+        for event in stream_llm_with_context(
+            user_query=user_query,
+            matches=matches,
+            llm_model=sel_model,
+            text_of=db.paragraph_text
+        ):
+            if event["type"] == "sources":
+                sources = event
+            elif event["type"] == "done":
+                answer = {"answer": event["answer"], "sources": sources["sources"],
+                          "confidence": sources["confidence"]}
+                answer_cache.put(sel_model, *key, answer, variant="rag_stream", seconds=event["total_s"])
+            yield event
+    else:
+        yield from stream_local_llm(user_query=user_query, llm_model=sel_model)
@@ -0,0 +1,603 @@
+"""
+Performance benchmarks that run without a real Ollama, against a local
+stand-in server.
+
+    python benchmarks.py embed
+    python benchmarks.py ann [--index-path src/vector_db]
+    python benchmarks.py startup [--index-path src/vector_db]
+    python benchmarks.py lexical [--index-path src/vector_db]
+    python benchmarks.py search_many
+    python benchmarks.py quantization [--index-path src/vector_db]
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+# ---------------- OLLAMA STAND-IN ----------------
+def fake_embedding(text, dim=1024):
+    """Deterministic unit vector per text, so repeated runs are comparable."""
+    seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+
+        if self.path == "/api/embed":
+            texts = body.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+
+            with server.counter_lock:
+                server.embed_requests += 1
+                overloaded = server.embed_requests <= server.fail_first
+            if overloaded:
+                self._send_json(503, {"error": "server busy"})
+                return
+            if any(marker in t for t in texts for marker in server.reject_texts):
+                # What Ollama answers for input it cannot embed
+                self._send_json(400, {"error": "input cannot be embedded"})
+                return
+
+            time.sleep(server.latency + server.per_text_latency * len(texts))
+
+            payload = {
+                "model": body.get("model"),
+                "embeddings": [fake_embedding(t, server.dim).tolist() for t in texts],
+                "prompt_eval_count": sum(len(t.split()) for t in texts),
+            }
+        elif self.path == "/api/generate":
+            words = [f"word{i}" for i in range(server.answer_tokens)]
+            if body.get("stream", True):
+                self._stream_generate(body, words)
+                return
+            time.sleep(server.latency + server.token_latency * len(words))
+            payload = {"model": body.get("model"), "response": " ".join(words), "done": True,
+                       "eval_count": len(words)}
+        elif self.path == "/api/show":
+            payload = {"details": {"family": "llama"}, "capabilities": ["completion"]}
+            if "bge" in body.get("model", ""):
+                payload = {"details": {"family": "bert"}, "capabilities": ["embedding"]}
+        else:
+            self.send_error(404)
+            return
+
+        self._send_json(200, payload)
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            self.send_error(404)
+            return
+        models = [{"name": name, "digest": name, "size": 1} for name in ("llama3:8b", "bge-m3:latest")]
+        self._send_json(200, {"models": models})
+
+    def _stream_generate(self, body, words):
+        # NDJSON chunks, one token each, like Ollama with "stream": true
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(obj):
+            line = json.dumps(obj).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(server.latency)
+        for word in words:
+            time.sleep(server.token_latency)
+            send({"model": body.get("model"), "response": word + " ", "done": False})
+        send({"model": body.get("model"), "response": "", "done": True,
+              "eval_count": len(words), "eval_duration": int(server.token_latency * len(words) * 1e9)})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOllamaServer:
+    """
+    Minimal /api/embed, /api/generate, /api/tags and /api/show stand-in
+    on a free localhost port.
+
+    For the failure paths: the first fail_first embed requests get a 503,
+    and any embed request containing one of reject_texts gets a 400.
+
+        with FakeOllamaServer(latency=0.05) as server:
+            BGEVectorStore(ollama_url=server.embed_url)
+    """
+
+    def __init__(self, latency=0.05, per_text_latency=0.001, dim=1024,
+                 token_latency=0.01, answer_tokens=40, fail_first=0, reject_texts=()):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllamaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.per_text_latency = per_text_latency
+        self.httpd.dim = dim
+        self.httpd.token_latency = token_latency
+        self.httpd.answer_tokens = answer_tokens
+        self.httpd.fail_first = fail_first
+        self.httpd.reject_texts = tuple(reject_texts)
+        self.httpd.embed_requests = 0
+        self.httpd.counter_lock = threading.Lock()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def embed_url(self):
+        return f"{self.url}/api/embed"
+
+    @property
+    def generate_url(self):
+        return f"{self.url}/api/generate"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def synthetic_records(n, words=18):
+    vocab = ("pointer array struct memory compiler function loop variable "
+             "header macro string integer stack heap file buffer").split()
+    rng = np.random.default_rng(0)
+    return [
+        {
+            "embedding_text": f"Record {i}: " + " ".join(rng.choice(vocab, size=words)),
+            "source_type": "text",
+            "source_name": "synthetic.txt",
+        }
+        for i in range(n)
+    ]
+
+
+# ---------------- BENCHMARKS ----------------
+def bench_embedding_pipeline(n_texts=2000, batch_size=32, in_flight=(1, 2, 4, 8), latency=0.05):
+    """Ingestion throughput of add_documents() for different in-flight limits."""
+    from embedding_cache import EmbeddingCache
+    from vector_database import BGEVectorStore
+
+    records = synthetic_records(n_texts)
+    rows = []
+
+    with FakeOllamaServer(latency=latency) as server:
+        for k in in_flight:
+            store = BGEVectorStore(
+                ollama_url=server.embed_url,
+                index_path=tempfile.mkdtemp(),
+                embedding_cache=EmbeddingCache()  # cold cache every run
+            )
+            store.add_documents(records, batch_size=batch_size, max_in_flight=k)
+            rows.append({"max_in_flight": k, **store.last_ingest_stats})
+
+    print("\nmax_in_flight  texts/s   tokens/s   seconds")
+    for r in rows:
+        print(f"{r['max_in_flight']:>13}  {r['texts_per_s']:>7}  {r['tokens_per_s']:>9}  {r['seconds']:>8}")
+    return rows
+
+
+def clustered_vectors(n, dim=1024, n_clusters=200, spread=0.6, seed=0):
+    """Unit vectors around random centres; closer to real embeddings than pure noise."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_clusters, dim)).astype("float32")
+    points = centres[rng.integers(0, n_clusters, size=n)]
+    points += spread * rng.standard_normal((n, dim)).astype("float32")
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    return points
+
+
+ANN_SETTINGS = [
+    ("ivf_flat", {}, "nprobe", [1, 4, 16, 64]),
+    ("ivf_pq", {}, "nprobe", [4, 16, 64]),
+    ("hnsw", {}, "ef_search", [16, 64, 256]),
+]
+
+
+def bench_ann_recall(index_path=None, n=20000, n_queries=200, k=10, dim=1024):
+    """
+    recall@k and per-query latency of each ANN index type against the
+    exact flat index. With index_path, the vectors of that saved store are
+    used (held-out vectors become the queries), so the numbers reflect
+    our own corpus size and distribution.
+    """
+    from index_factory import all_vectors, make_index, search_params
+
+    if index_path:
+        from vector_database import BGEVectorStore
+        store = BGEVectorStore(index_path=index_path)
+        store.load()
+        vectors = all_vectors(store.index)
+        dim = vectors.shape[1]
+    else:
+        vectors = clustered_vectors(n + n_queries, dim)
+
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:n_queries]]
+    corpus = vectors[order[n_queries:]]
+
+    flat = make_index("flat", dim)
+    flat.add(corpus)
+    _, truth = flat.search(queries, k)
+
+    def measure(index, params):
+        found = np.empty_like(truth)
+        start = time.perf_counter()
+        for i in range(len(queries)):
+            _, found[i:i + 1] = index.search(queries[i:i + 1], k, params=params)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+        return recall, latency_ms
+
+    rows = [("flat", "-", *measure(flat, None), 0.0)]
+
+    for index_type, params, knob, values in ANN_SETTINGS:
+        start = time.perf_counter()
+        index = make_index(index_type, dim, params, n_train=len(corpus))
+        if not index.is_trained:
+            index.train(corpus)
+        index.add(corpus)
+        build_s = time.perf_counter() - start
+
+        for value in values:
+            knobs = {knob: value}
+            recall, latency_ms = measure(index, search_params(index, **knobs))
+            rows.append((index_type, f"{knob}={value}", recall, latency_ms, build_s))
+
+    print(f"\n{len(corpus)} vectors, {len(queries)} queries, recall@{k}")
+    print("index      setting         recall@k  ms/query  build_s")
+    for index_type, setting, recall, latency_ms, build_s in rows:
+        print(f"{index_type:<10} {setting:<15} {recall:>8.3f}  {latency_ms:>8.3f}  {build_s:>7.2f}")
+    return rows
+
+
+QUANTIZATION_SETTINGS = [
+    ("fp16", {"rescore": False}),
+    ("sq8", {"rescore": False}),
+    ("sq8", {"rescore": True}),
+    ("binary", {"rescore_factor": 4}),
+    ("binary", {"rescore_factor": 16}),
+    ("binary", {"rescore_factor": 64}),
+]
+
+
+def bench_quantization(index_path=None, n=20000, n_queries=200, k=10, dim=1024):
+    """
+    Memory saved versus recall@k lost for each quantized index type,
+    against the exact float32 flat index. Re-scoring reads the candidates
+    from a memory-mapped full-precision file, as the store does. With
+    index_path, the vectors of that saved store are used.
+    """
+    from full_precision import FullPrecisionVectors, rescore
+    from index_factory import all_vectors, make_index, resolve_index_params
+
+    if index_path:
+        from vector_database import BGEVectorStore
+        store = BGEVectorStore(index_path=index_path)
+        store.load()
+        if store.full_vectors is not None:
+            vectors = store.full_vectors.get(np.arange(len(store.full_vectors)))
+        else:
+            vectors = all_vectors(store.index)
+        dim = vectors.shape[1]
+    else:
+        vectors = clustered_vectors(n + n_queries, dim)
+
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:n_queries]]
+    corpus = vectors[order[n_queries:]]
+
+    flat = make_index("flat", dim)
+    flat.add(corpus)
+    _, truth = flat.search(queries, k)
+    flat_mb = corpus.nbytes / 1e6
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vectors.npy")
+        FullPrecisionVectors(dim, corpus).save(path)
+        full = FullPrecisionVectors.load(path)
+
+        rows = [("flat", "-", flat_mb, 1.0, None)]
+        for index_type, params in QUANTIZATION_SETTINGS:
+            params = resolve_index_params(index_type, params)
+            index = make_index(index_type, dim, params)
+            if not index.is_trained:
+                index.train(corpus[:params["train_size"]])
+            index.add(corpus)
+
+            fetch = k * params["rescore_factor"] if params["rescore"] else k
+            found = []
+            start = time.perf_counter()
+            for i in range(len(queries)):
+                _, ids = index.search(queries[i:i + 1], fetch)
+                ids = [int(x) for x in ids[0] if x != -1]
+                if params["rescore"]:
+                    ids = [idx for idx, _ in rescore(queries[i], ids, full, k)]
+                found.append(ids[:k])
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+            setting = f"x{params['rescore_factor']}" if params["rescore"] else "no"
+            rows.append((index_type, setting, index.code_size * index.ntotal / 1e6, recall, latency_ms))
+
+    print(f"\n{len(corpus)} vectors of {dim} dims, {len(queries)} queries, recall@{k} vs exact float32")
+    print("index   rescore  memory_mb  saved   recall@k  lost    ms/query")
+    for index_type, setting, memory_mb, recall, latency_ms in rows:
+        latency = f"{latency_ms:>8.3f}" if latency_ms is not None else "       -"
+        print(f"{index_type:<7} {setting:<7} {memory_mb:>10.1f}  {1 - memory_mb / flat_mb:>5.0%}  "
+              f"{recall:>8.3f}  {1 - recall:>5.3f}  {latency}")
+    print("(re-scoring also keeps a float32 copy on disk, paged in only for the candidates)")
+    return rows
+
+
+def bench_lexical(index_path=None, n=50000, n_queries=500, k=50):
+    """
+    Build time, memory footprint and per-query latency of the BM25 index,
+    in memory and memory-mapped from disk. With index_path, the lexical
+    index of that saved store is measured with its own texts as queries.
+    """
+    from lexical_index import LexicalIndex
+
+    if index_path:
+        from vector_database import BGEVectorStore
+        store = BGEVectorStore(index_path=index_path)
+        store.load(mmap=True)
+        texts = [t or "" for t in store.metadata.column("embedding_text")]
+    else:
+        texts = [r["embedding_text"] for r in synthetic_records(n)]
+
+    start = time.perf_counter()
+    index = LexicalIndex.build(texts)
+    build_s = time.perf_counter() - start
+
+    rng = np.random.default_rng(2)
+    queries = [" ".join(texts[i].split()[:4]) for i in rng.integers(0, len(texts), size=n_queries)]
+
+    def measure(lexical):
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            lexical.search(q, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    rows = [("delta (after add)", index.stats(), *measure(index))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index.save(tmp)
+        save_s = time.perf_counter() - start
+        rows.append(("compacted", index.stats(), *measure(index)))
+        mapped = LexicalIndex.load(tmp, mmap=True)
+        rows.append(("mmap", mapped.stats(), *measure(mapped)))
+        disk_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+
+    stats = rows[-1][1]
+    print(f"\n{stats['docs']} docs, {stats['terms']} terms, {stats['postings']} postings; "
+          f"build {build_s:.2f}s, save {save_s:.2f}s, {disk_mb:.2f} MB on disk")
+    print("layout              memory_mb  p50_ms  p99_ms")
+    for layout, stats, p50, p99 in rows:
+        print(f"{layout:<19} {stats['memory_mb']:>9}  {p50:>6.2f}  {p99:>6.2f}")
+    return rows
+
+
+def bench_search_many(n_docs=5000, n_queries=1000, top_k=5, batch_size=64, latency=0.02):
+    """
+    Query throughput of search_many() against a loop over search(), with
+    cold embedding caches and the same per-request latency for both.
+    """
+    from embedding_cache import EmbeddingCache
+    from vector_database import BGEVectorStore
+
+    records = synthetic_records(n_docs)
+    queries = [f"question {i} about " + r["embedding_text"].split(":", 1)[1]
+               for i, r in enumerate(synthetic_records(n_queries, words=6))]
+
+    with FakeOllamaServer(latency=latency) as server:
+        store = BGEVectorStore(ollama_url=server.embed_url, index_path=tempfile.mkdtemp())
+        store.add_documents(records)
+
+        store.embedding_cache = EmbeddingCache()
+        start = time.perf_counter()
+        looped = [store.search(q, top_k=top_k) for q in queries]
+        loop_s = time.perf_counter() - start
+
+        store.embedding_cache = EmbeddingCache()
+        start = time.perf_counter()
+        batched = store.search_many(queries, top_k=top_k, batch_size=batch_size)
+        batch_s = time.perf_counter() - start
+
+    same = all(
+        [r["vector_id"] for r in a] == [r["vector_id"] for r in b] for a, b in zip(looped, batched)
+    )
+    rows = [("search loop", loop_s), (f"search_many({batch_size})", batch_s)]
+
+    print(f"\n{n_queries} queries over {n_docs} vectors, top_k={top_k}, "
+          f"{latency * 1000:.0f} ms per embed request")
+    print("method              seconds  queries/s")
+    for method, seconds in rows:
+        print(f"{method:<19} {seconds:>7.2f}  {n_queries / seconds:>9.1f}")
+    print(f"speedup x{loop_s / batch_s:.1f}, identical results: {same}")
+    return rows
+
+
+# Modules a query-only process must not load at startup
+HEAVY_MODULES = ("whisper", "torch", "fitz", "docx", "nltk", "faiss")
+
+
+def bench_import_time(module="app", target_ms=1000, top=15):
+    """
+    Cold import profile of module (python -X importtime) in a fresh
+    interpreter: total time, the slowest modules, and whether any heavy
+    dependency was pulled in. Exits non-zero when over target_ms.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        raise SystemExit(f"❌ import {module} failed")
+
+    # "import time: self [us] | cumulative | imported package"
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    total_ms = next(c for name, _, c in rows if name == module) / 1000
+    loaded_heavy = sorted({
+        name.split(".")[0] for name, _, _ in rows if name.split(".")[0] in HEAVY_MODULES
+    })
+
+    print(f"\nimport {module}: {total_ms:.0f} ms (target {target_ms} ms)")
+    print("module                                    self_ms  cumulative_ms")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"{name:<40} {self_us / 1000:>8.1f}  {cumulative_us / 1000:>13.1f}")
+    print(f"heavy modules loaded: {', '.join(loaded_heavy) or 'none'}")
+
+    ok = total_ms <= target_ms and not loaded_heavy
+    print("✅ within budget" if ok else "❌ over budget")
+    if not ok:
+        raise SystemExit(1)
+    return {"module": module, "total_ms": total_ms, "heavy_modules": loaded_heavy}
+
+
+# Loads an index the way the resident store does and reports the RSS it added
+_RSS_PROBE = """
+import os, sys
+import faiss  # imported up front so its own footprint is not counted
+from index_factory import read_index
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        return int(f.read().split("VmRSS:")[1].split()[0]) / 1024
+
+before = rss_mb()
+index = read_index(sys.argv[1], mmap=True)
+print(index.ntotal, rss_mb() - before)
+"""
+
+
+def bench_mapped_rss(index_path=None, n=25000, dim=1024, index_types=("flat", "sq8"), max_share=0.1):
+    """
+    Resident memory added by opening an index memory-mapped, in a fresh
+    interpreter. A mapped index should add almost nothing until its pages
+    are searched; one read into memory adds its whole file size. With
+    index_path, the current generation of that saved store is checked.
+    Exits non-zero when any index adds more than max_share of its size.
+    """
+    if not os.path.exists("/proc/self/status"):
+        print("RSS check skipped (needs /proc)")
+        return []
+
+    from index_factory import make_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if index_path:
+            from vector_database import _current_generation_dir
+            paths = [("store", os.path.join(_current_generation_dir(index_path), "index.faiss"))]
+        else:
+            import faiss
+            vectors = clustered_vectors(n, dim)
+            paths = []
+            for index_type in index_types:
+                index = make_index(index_type, dim)
+                if not index.is_trained:
+                    index.train(vectors)
+                index.add(vectors)
+                paths.append((index_type, os.path.join(tmp, f"{index_type}.faiss")))
+                faiss.write_index(index, paths[-1][1])
+                del index
+
+        rows = []
+        for name, path in paths:
+            proc = subprocess.run(
+                [sys.executable, "-c", _RSS_PROBE, path],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(proc.stderr[-2000:])
+                raise SystemExit(f"❌ loading {path} failed")
+            ntotal, added_mb = proc.stdout.split()
+            rows.append((name, int(ntotal), os.path.getsize(path) / 2 ** 20, float(added_mb)))
+
+    print("\nindex    vectors  file_mb  rss_added_mb")
+    for name, ntotal, file_mb, added_mb in rows:
+        print(f"{name:<8} {ntotal:>7}  {file_mb:>7.1f}  {added_mb:>12.1f}")
+
+    ok = all(added_mb <= max(file_mb * max_share, 5) for _, _, file_mb, added_mb in rows)
+    print("✅ indexes are memory-mapped" if ok else "❌ an index was read into memory")
+    if not ok:
+        raise SystemExit(1)
+    return rows
+
+
+def bench_startup(index_path=None):
+    """Cold import budget of the web app, then the memory-mapped index check."""
+    result = bench_import_time()
+    bench_mapped_rss(index_path)
+    return result
+
+
+BENCHMARKS = {
+    "embed": bench_embedding_pipeline,
+    "ann": bench_ann_recall,
+    "startup": bench_startup,
+    "lexical": bench_lexical,
+    "search_many": bench_search_many,
+    "quantization": bench_quantization,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VectorMind benchmarks")
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--index-path", help="saved store to benchmark instead of synthetic data")
+    args = parser.parse_args()
+
+    benchmark = BENCHMARKS[args.name]
+    if args.index_path:
+        if "index_path" not in inspect.signature(benchmark).parameters:
+            parser.error(f"{args.name} runs on synthetic data only and does not take --index-path")
+        benchmark(index_path=args.index_path)
+    else:
+        benchmark()
@@ -0,0 +1,136 @@
+import re
+
+# Tokens of retrieved context allowed in a RAG prompt, by model name or
+# prefix ("llama3" matches "llama3:8b"). Sized for Ollama's default
+# context window, leaving room for the instructions, question and answer;
+# raise an entry together with the model's num_ctx.
+DEFAULT_CONTEXT_BUDGET = 1500
+CONTEXT_BUDGETS = {
+    "llama3.2:1b": 1000,
+    "llama3.2": 1500,
+    "llama3": 1500,
+}
+
+CHARS_PER_TOKEN = 4  # rough average for English text
+
+
+def context_budget(llm_model=None):
+    """Longest matching CONTEXT_BUDGETS entry for llm_model, else the default."""
+    if llm_model:
+        for name in sorted(CONTEXT_BUDGETS, key=len, reverse=True):
+            if llm_model == name or llm_model.startswith(name):
+                return CONTEXT_BUDGETS[name]
+    return DEFAULT_CONTEXT_BUDGET
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _segment_index(paragraph_id):
+    match = re.search(r"_seg(\d+)$", paragraph_id)
+    return int(match.group(1)) if match else 0
+
+
+def _document_passage(r):
+    return {
+        "text": r.get("paragraph_text") or r["embedding_text"],
+        "score": r["score"],
+        "source_name": r.get("source_name", "unknown"),
+        "page": r.get("page"),
+        "matches": 1,
+    }
+
+
+def _audio_passage(r):
+    return {
+        "text": r.get("context_text") or r["embedding_text"],
+        "score": r["score"],
+        "source_name": r.get("source_name", "unknown"),
+        "start_time": r["start_time"],
+        "end_time": r["end_time"],
+        "context_ids": list(r["context_ids"]),
+        "matches": 1,
+    }
+
+
+def pack_context(matches, llm_model=None, budget=None, text_of=None):
+    """
+    Turn search results into prompt passages, best score first:
+
+    - matches sharing a paragraph_id become one passage (its paragraph);
+    - audio matches whose time windows overlap in the same file become
+      one passage covering the union of their windows. The text is
+      rebuilt from segment ids through text_of(paragraph_id) when given,
+      otherwise the best match's context_text is kept;
+    - passages are added while they fit the model's token budget
+      (context_budget); one that does not fit is skipped in favour of
+      smaller ones, and a first passage larger than the whole budget is
+      truncated.
+
+    Each passage: text, score, source_name, page or start_time/end_time,
+    matches (how many results it absorbed) and tokens.
+    """
+    budget = budget or context_budget(llm_model)
+    ranked = sorted(matches, key=lambda r: r["score"], reverse=True)
+
+    passages = []
+    by_paragraph = {}
+    audio = []
+
+    for r in ranked:
+        if "context_ids" in r and "start_time" in r:
+            source = r.get("source_path") or r.get("source_name")
+            for p in audio:
+                if (p["_source"] == source
+                        and r["start_time"] <= p["end_time"] and p["start_time"] <= r["end_time"]):
+                    p["start_time"] = min(p["start_time"], r["start_time"])
+                    p["end_time"] = max(p["end_time"], r["end_time"])
+                    p["context_ids"] = sorted(set(p["context_ids"]) | set(r["context_ids"]), key=_segment_index)
+                    p["matches"] += 1
+                    break
+            else:
+                passage = _audio_passage(r)
+                passage["_source"] = source
+                audio.append(passage)
+                passages.append(passage)
+            continue
+
+        key = r.get("paragraph_id") or r["embedding_text"]
+        if key in by_paragraph:
+            by_paragraph[key]["matches"] += 1
+            continue
+        passage = by_paragraph[key] = _document_passage(r)
+        passages.append(passage)
+
+    for p in audio:
+        del p["_source"]
+        ids = p.pop("context_ids")
+        if text_of is not None and p["matches"] > 1:
+            texts = [text_of(pid) for pid in ids]
+            p["text"] = " ".join(t for t in texts if t)
+
+    # The same paragraph text under different ids (repeated headers, copies)
+    seen_texts = set()
+    packed = []
+    used = 0
+
+    for p in passages:
+        text = p["text"].strip()
+        if not text or text in seen_texts:
+            continue
+        seen_texts.add(text)
+
+        tokens = estimate_tokens(text)
+        if used + tokens > budget:
+            if packed:
+                continue
+            text = text[:budget * CHARS_PER_TOKEN]
+            tokens = estimate_tokens(text)
+
+        p["text"] = text
+        p["tokens"] = tokens
+        packed.append({k: v for k, v in p.items() if v is not None})
+        used += tokens
+
+    return packed
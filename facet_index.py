@@ -0,0 +1,111 @@
+import json
+import os
+
+import numpy as np
+
+# Metadata fields search() can filter on by value
+FACETS = ("source_type", "source_name")
+NO_PAGE = -1  # rows without a page (text files, audio)
+
+_NO_IDS = np.zeros(0, dtype="int64")
+
+
+def _column(metadata, name):
+    if hasattr(metadata, "column"):
+        return metadata.column(name)  # ColumnarMetadata: one field, no row dicts
+    return [r.get(name) for r in metadata]
+
+
+class FacetIndex:
+    """
+    Precomputed row ids per facet value (source_type, source_name) and the
+    page of every row, so a filtered search becomes one boolean row mask
+    that FAISS and the lexical index restrict themselves to, instead of
+    over-fetching and filtering afterwards.
+    """
+
+    def __init__(self, n_rows, ids, pages):
+        self.n_rows = n_rows
+        self.ids = ids      # facet -> {value: sorted int64 row ids}
+        self.pages = pages  # int32 per row, NO_PAGE when unknown
+
+    @classmethod
+    def build(cls, metadata):
+        ids = {}
+        for facet in FACETS:
+            groups = {}
+            for i, value in enumerate(_column(metadata, facet)):
+                if value is not None:
+                    groups.setdefault(value, []).append(i)
+            ids[facet] = {value: np.array(rows, dtype="int64") for value, rows in groups.items()}
+
+        pages = np.array(
+            [NO_PAGE if p is None else p for p in _column(metadata, "page")], dtype="int32"
+        )
+        return cls(len(pages), ids, pages)
+
+    # FILTER
+    def mask(self, source_type=None, source_name=None, pages=None):
+        """
+        Rows matching every given filter, or None when there is no filter.
+        source_type / source_name: one value or a list of values;
+        pages: one page or an inclusive (first, last) range.
+        """
+        mask = None
+
+        for facet, wanted in (("source_type", source_type), ("source_name", source_name)):
+            if wanted is None:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            facet_mask = np.zeros(self.n_rows, dtype=bool)
+            for value in wanted:
+                facet_mask[self.ids[facet].get(value, _NO_IDS)] = True
+            mask = facet_mask if mask is None else mask & facet_mask
+
+        if pages is not None:
+            first, last = pages if isinstance(pages, (tuple, list)) else (pages, pages)
+            page_mask = (self.pages >= first) & (self.pages <= last) & (self.pages != NO_PAGE)
+            mask = page_mask if mask is None else mask & page_mask
+
+        return mask
+
+    def values(self, facet):
+        """Distinct values of a facet with their row counts."""
+        return {value: len(rows) for value, rows in self.ids[facet].items()}
+
+    # PERSISTENCE
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+
+        # One code per row (-1 = missing); the id sets are rebuilt from it on load
+        values = {}
+        for facet in FACETS:
+            values[facet] = list(self.ids[facet])
+            codes = np.full(self.n_rows, -1, dtype="int32")
+            for code, rows in enumerate(self.ids[facet].values()):
+                codes[rows] = code
+            np.save(os.path.join(path, f"{facet}.npy"), codes)
+
+        np.save(os.path.join(path, "page.npy"), self.pages)
+        with open(os.path.join(path, "values.json"), "w", encoding="utf-8") as f:
+            json.dump(values, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "values.json"), "r", encoding="utf-8") as f:
+            values = json.load(f)
+
+        ids = {}
+        for facet in FACETS:
+            codes = np.load(os.path.join(path, f"{facet}.npy"))
+            order = np.argsort(codes, kind="stable").astype("int64")
+            counts = np.bincount(codes[codes >= 0], minlength=len(values[facet]))
+            start = int(np.sum(codes < 0))
+            ids[facet] = {}
+            for value, count in zip(values[facet], counts):
+                ids[facet][value] = order[start:start + count]
+                start += count
+
+        pages = np.load(os.path.join(path, "page.npy"))
+        return cls(len(pages), ids, pages)
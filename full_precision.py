@@ -0,0 +1,84 @@
+import numpy as np
+
+CHUNK_ROWS = 65536  # rows copied at a time when writing
+
+
+class FullPrecisionVectors:
+    """
+    float32 copy of every indexed vector, row i == index row i, kept next
+    to a quantized index (sq8/fp16/binary) to re-score its candidates
+    exactly.
+
+    Saved as vectors.npy and memory-mapped on load, so serving only pages
+    in the rows it re-scores; vectors added afterwards are held in memory
+    until the next save, like LexicalIndex's delta.
+    """
+
+    def __init__(self, dim, base=None):
+        self.dim = dim
+        self.base = base if base is not None else np.empty((0, dim), dtype="float32")
+        self._pending = []
+        self._pending_rows = None  # _pending stacked, built on first read
+
+    def __len__(self):
+        return len(self.base) + sum(len(v) for v in self._pending)
+
+    def add(self, vectors):
+        self._pending.append(np.asarray(vectors, dtype="float32"))
+        self._pending_rows = None
+
+    def _pending_array(self):
+        if self._pending_rows is None:
+            self._pending_rows = (
+                np.vstack(self._pending) if self._pending else np.empty((0, self.dim), dtype="float32")
+            )
+        return self._pending_rows
+
+    def get(self, ids):
+        """(len(ids), dim) float32 rows."""
+        ids = np.asarray(ids, dtype="int64")
+        n_base = len(self.base)
+        if not self._pending:
+            return np.asarray(self.base[ids])
+
+        rows = np.empty((len(ids), self.dim), dtype="float32")
+        in_base = ids < n_base
+        rows[in_base] = self.base[ids[in_base]]
+        rows[~in_base] = self._pending_array()[ids[~in_base] - n_base]
+        return rows
+
+    def remove_ids(self, ids):
+        """Remove rows; later rows shift down like in the FAISS index."""
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.asarray(ids, dtype="int64")] = False
+        self.base = self.get(np.flatnonzero(keep))
+        self._pending = []
+        self._pending_rows = None
+
+    # PERSISTENCE
+    def save(self, path):
+        n_base = len(self.base)
+        out = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(len(self), self.dim))
+        for start in range(0, n_base, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, n_base)
+            out[start:end] = self.base[start:end]
+        out[n_base:] = self._pending_array()
+        out.flush()
+        del out
+
+    @classmethod
+    def load(cls, path):
+        base = np.load(path, mmap_mode="r")
+        return cls(base.shape[1], base)
+
+    def nbytes(self):
+        return len(self) * self.dim * 4
+
+
+def rescore(query_embedding, ids, vectors, k):
+    """Exact [(id, cosine)] best first for candidate ids, from FullPrecisionVectors."""
+    if not ids:
+        return []
+    scores = vectors.get(ids) @ query_embedding
+    best = np.argsort(-scores)[:k]
+    return [(int(ids[i]), float(scores[i])) for i in best]
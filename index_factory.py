@@ -0,0 +1,176 @@
+import math
+
+from lazy_import import LazyModule
+import numpy as np
+
+faiss = LazyModule("faiss")  # imported on first use, not at startup
+
+# Index types BGEVectorStore can be configured with
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8", "fp16", "binary")
+
+# Exhaustive like flat, but storing each vector compressed: 1 byte (sq8),
+# 2 bytes (fp16) or 1 bit (binary, sign of each dimension) per dimension
+# instead of 4. With "rescore", the top rescore_factor * k candidates are
+# re-scored against full-precision vectors kept in a memory-mapped file.
+QUANTIZED_TYPES = ("sq8", "fp16", "binary")
+
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": None, "nprobe": 16, "train_size": 50000, "min_train": 2000},
+    "ivf_pq": {"nlist": None, "nprobe": 16, "train_size": 50000, "min_train": 10000,
+               "pq_m": 64, "pq_nbits": 8},
+    "hnsw": {"hnsw_m": 32, "ef_construction": 200, "ef_search": 64},
+    "sq8": {"train_size": 20000, "min_train": 1000, "rescore": False, "rescore_factor": 4},
+    "fp16": {"rescore": False, "rescore_factor": 4},
+    "binary": {"rescore": True, "rescore_factor": 16},
+}
+
+
+def resolve_index_params(index_type, params=None):
+    """Defaults for index_type overlaid with the caller's params."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+    merged = dict(DEFAULT_INDEX_PARAMS[index_type])
+    merged.update(params or {})
+    if index_type == "binary":
+        merged["rescore"] = True  # Hamming distances are not cosine similarities
+    return merged
+
+
+def needs_training(index_type):
+    # sq8 learns each dimension's range from a sample
+    return index_type.startswith("ivf") or index_type == "sq8"
+
+
+def removes_in_place(index):
+    """True when remove_ids() shifts later rows down (flat and quantized flat indexes)."""
+    return stored_index_type(index) in ("flat",) + QUANTIZED_TYPES
+
+
+def choose_nlist(n_vectors, requested=None):
+    """
+    ~4*sqrt(N) lists, but never so many that a list gets fewer than the
+    ~39 training points faiss wants per centroid.
+    """
+    nlist = requested or int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // 39))
+
+
+def make_index(index_type, dim, params=None, n_train=0):
+    """
+    Build an empty inner-product index. IVF types need n_train (the number
+    of vectors they will be trained on) to size nlist.
+    """
+    params = resolve_index_params(index_type, params)
+
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "fp16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "binary":
+        # One sign bit per dimension, no rotation or learned thresholds
+        return faiss.IndexLSH(dim, dim, False, False)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+        return index
+
+    nlist = choose_nlist(n_train, params["nlist"])
+
+    if index_type == "ivf_flat":
+        description = f"IVF{nlist},Flat"
+    else:
+        description = f"IVF{nlist},PQ{params['pq_m']}x{params['pq_nbits']}"
+
+    index = faiss.index_factory(dim, description, faiss.METRIC_INNER_PRODUCT)
+    faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    return index
+
+
+def read_index(path, mmap=False):
+    """
+    Load a saved index. With mmap=True the stored vectors/codes are
+    memory-mapped read-only, so processes serving the same generation
+    share one copy through the page cache.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    # IO_FLAG_MMAP alone still reads the codes of IndexFlatCodes indexes
+    # (flat, sq8/fp16, binary, HNSW storage) into memory; IO_FLAG_MMAP_IFC
+    # maps those and, on the faiss versions that have it, IVF lists too
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is None:
+        flag = faiss.IO_FLAG_MMAP
+    return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+
+
+def stored_index_type(index):
+    """Which INDEX_TYPES entry a (possibly loaded) faiss index corresponds to."""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    if isinstance(index, faiss.IndexLSH):
+        return "binary"
+    return "flat"
+
+
+def all_vectors(index):
+    """Reconstruct every stored vector (lossy for PQ)."""
+    if index.ntotal == 0:
+        return np.empty((0, index.d), dtype="float32")
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def stored_vectors(index, ids):
+    """Reconstruct the vectors of the given ids (lossy for PQ)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+
+
+def search_params(index, nprobe=None, ef_search=None, allowed=None):
+    """
+    Per-query search parameters, or None to use the index defaults.
+
+    allowed: boolean row mask; the search only returns those rows. IVF and
+    HNSW explore proportionally more of the index the fewer rows pass,
+    so a narrow filter still finds k of them.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = isinstance(index, faiss.IndexHNSW)
+
+    if allowed is None:
+        if nprobe is not None and ivf is not None:
+            return faiss.SearchParametersIVF(nprobe=nprobe)
+        if ef_search is not None and hnsw:
+            return faiss.SearchParametersHNSW(efSearch=ef_search)
+        return None
+
+    selector = faiss.IDSelectorBitmap(np.packbits(allowed, bitorder="little"))
+    fraction = max(float(np.mean(allowed)), 1e-6)
+
+    # Parameter objects replace the index defaults, so always set them
+    if ivf is not None:
+        nprobe = min(ivf.nlist, math.ceil((nprobe or ivf.nprobe) / fraction))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if hnsw:
+        ef_search = min(index.ntotal, math.ceil((ef_search or index.hnsw.efSearch) / fraction))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=max(ef_search, 16))
+    return faiss.SearchParameters(sel=selector)
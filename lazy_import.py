@@ -0,0 +1,23 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module (faiss, torch, ...) that is imported on
+    first attribute access instead of when the importing module loads.
+
+        faiss = LazyModule("faiss")
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
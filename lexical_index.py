@@ -0,0 +1,233 @@
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Words too common to help a keyword search; identifiers and codes stay
+STOPWORDS = frozenset("""
+a an and are as at be but by do does for from had has have how i if in into is it
+its of on or so than that the their then there these this to was were what when
+where which who why will with you your can not no
+""".split())
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower-cased word/identifier tokens (printf, malloc, e2001, 0x1f), minus stopwords."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the same rows as the FAISS index (doc id ==
+    vector id).
+
+    The saved form is a term list plus postings in CSR layout (per-term
+    offsets into doc id / term frequency arrays), memory-mapped on load.
+    Documents added afterwards go to a small in-memory delta, so appends
+    never rewrite the base; removals renumber the remaining rows in one
+    vectorized pass, the same way the FAISS index shifts them.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+
+        self.terms = {}                                  # term -> row in offsets
+        self.offsets = np.zeros(1, dtype="int64")
+        self.doc_ids = np.zeros(0, dtype="int32")
+        self.tfs = np.zeros(0, dtype="uint16")
+        self.doc_len = np.zeros(0, dtype="int32")
+
+        self._delta = defaultdict(lambda: ([], []))      # term -> (doc ids, tfs)
+        self._delta_len = []
+
+    @property
+    def n_docs(self):
+        return len(self.doc_len) + len(self._delta_len)
+
+    @classmethod
+    def build(cls, texts, **kwargs):
+        index = cls(**kwargs)
+        index.add(texts)
+        return index
+
+    # UPDATE
+    def add(self, texts):
+        """Index texts as the next doc ids, in order."""
+        doc_id = self.n_docs
+        for text in texts:
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                ids, tfs = self._delta[term]
+                ids.append(doc_id)
+                tfs.append(min(tf, 65535))
+            self._delta_len.append(sum(counts.values()))
+            doc_id += 1
+
+    def _triples(self):
+        """(term index, doc id, tf) for every posting, base and delta, plus the term list."""
+        terms = list(self.terms)
+        term_rows = dict(self.terms)
+
+        term_idx = [np.repeat(np.arange(len(terms), dtype="int64"), np.diff(self.offsets))]
+        doc_ids = [np.asarray(self.doc_ids, dtype="int64")]
+        tfs = [np.asarray(self.tfs)]
+
+        for term, (ids, counts) in self._delta.items():
+            row = term_rows.get(term)
+            if row is None:
+                row = term_rows[term] = len(terms)
+                terms.append(term)
+            term_idx.append(np.full(len(ids), row, dtype="int64"))
+            doc_ids.append(np.asarray(ids, dtype="int64"))
+            tfs.append(np.asarray(counts, dtype="uint16"))
+
+        return terms, np.concatenate(term_idx), np.concatenate(doc_ids), np.concatenate(tfs)
+
+    def _compact(self, keep=None):
+        """Fold the delta into the base arrays; drop rows where keep is False and renumber."""
+        terms, term_idx, doc_ids, tfs = self._triples()
+        doc_len = np.concatenate([self.doc_len, np.asarray(self._delta_len, dtype="int32")])
+
+        if keep is not None:
+            new_ids = np.cumsum(keep) - 1
+            kept = keep[doc_ids]
+            term_idx, doc_ids, tfs = term_idx[kept], new_ids[doc_ids[kept]], tfs[kept]
+            doc_len = doc_len[keep]
+
+        order = np.lexsort((doc_ids, term_idx))
+        term_idx, doc_ids, tfs = term_idx[order], doc_ids[order], tfs[order]
+
+        counts = np.bincount(term_idx, minlength=len(terms))
+        live = counts > 0  # terms whose documents were all removed
+        self.terms = {t: i for i, t in enumerate(t for t, ok in zip(terms, live) if ok)}
+        self.offsets = np.concatenate([[0], np.cumsum(counts[live])]).astype("int64")
+        self.doc_ids = doc_ids.astype("int32")
+        self.tfs = tfs.astype("uint16")
+        self.doc_len = doc_len.astype("int32")
+
+        self._delta.clear()
+        self._delta_len = []
+
+    def remove_ids(self, ids):
+        """Remove rows; later rows shift down like in the FAISS index."""
+        keep = np.ones(self.n_docs, dtype=bool)
+        keep[np.asarray(ids, dtype="int64")] = False
+        self._compact(keep)
+
+    # SEARCH
+    def _postings(self, term):
+        parts_ids, parts_tfs = [], []
+        row = self.terms.get(term)
+        if row is not None:
+            start, end = self.offsets[row], self.offsets[row + 1]
+            parts_ids.append(np.asarray(self.doc_ids[start:end], dtype="int64"))
+            parts_tfs.append(np.asarray(self.tfs[start:end], dtype="float32"))
+        if term in self._delta:
+            ids, tfs = self._delta[term]
+            parts_ids.append(np.asarray(ids, dtype="int64"))
+            parts_tfs.append(np.asarray(tfs, dtype="float32"))
+        if not parts_ids:
+            return None, None
+        return np.concatenate(parts_ids), np.concatenate(parts_tfs)
+
+    def _doc_lengths(self, ids):
+        if not self._delta_len:
+            return np.asarray(self.doc_len[ids], dtype="float32")
+        all_len = np.concatenate([self.doc_len, np.asarray(self._delta_len, dtype="int32")])
+        return all_len[ids].astype("float32")
+
+    def search(self, query, k=50, allowed=None):
+        """[(doc_id, bm25 score)] best first; allowed: optional boolean mask of searchable docs."""
+        n_docs = self.n_docs
+        if n_docs == 0:
+            return []
+
+        avg_len = (int(np.sum(self.doc_len)) + sum(self._delta_len)) / n_docs or 1.0
+        all_ids, all_scores = [], []
+
+        for term in set(tokenize(query)):
+            ids, tfs = self._postings(term)
+            if ids is None:
+                continue
+            df = len(ids)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_lengths(ids) / avg_len)
+            all_ids.append(ids)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not all_ids:
+            return []
+
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        docs, inverse = np.unique(ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+
+        if allowed is not None:
+            keep = allowed[docs]
+            docs, totals = docs[keep], totals[keep]
+            if len(docs) == 0:
+                return []
+
+        k = min(k, len(docs))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(int(docs[i]), float(totals[i])) for i in top]
+
+    # PERSISTENCE
+    def save(self, path):
+        if self._delta or self._delta_len:
+            self._compact()
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump(list(self.terms), f, ensure_ascii=False)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "doc_ids.npy"), self.doc_ids)
+        np.save(os.path.join(path, "tfs.npy"), self.tfs)
+        np.save(os.path.join(path, "doc_len.npy"), self.doc_len)
+        with open(os.path.join(path, "bm25.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "n_docs": self.n_docs}, f)
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        with open(os.path.join(path, "bm25.json"), "r", encoding="utf-8") as f:
+            params = json.load(f)
+        index = cls(k1=params["k1"], b=params["b"])
+
+        with open(os.path.join(path, "terms.json"), "r", encoding="utf-8") as f:
+            index.terms = {t: i for i, t in enumerate(json.load(f))}
+
+        mode = "r" if mmap else None
+        index.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mode)
+        index.doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode=mode)
+        index.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode=mode)
+        index.doc_len = np.load(os.path.join(path, "doc_len.npy"), mmap_mode=mode)
+        return index
+
+    # STATS
+    def memory_bytes(self):
+        """Approximate footprint: postings arrays, term dictionary and pending delta."""
+        arrays = sum(a.nbytes for a in (self.offsets, self.doc_ids, self.tfs, self.doc_len))
+        term_dict = sys.getsizeof(self.terms) + sum(sys.getsizeof(t) + 28 for t in self.terms)
+        # Python lists of ints: pointer per entry plus the int objects of the doc ids
+        delta = sum(
+            sys.getsizeof(t) + sys.getsizeof(ids) + sys.getsizeof(tfs) + 28 * len(ids)
+            for t, (ids, tfs) in self._delta.items()
+        ) + sys.getsizeof(self._delta_len)
+        return arrays + term_dict + delta
+
+    def stats(self):
+        return {
+            "docs": self.n_docs,
+            "terms": len(self.terms) + sum(1 for t in self._delta if t not in self.terms),
+            "postings": len(self.doc_ids) + sum(len(ids) for ids, _ in self._delta.values()),
+            "memory_mb": round(self.memory_bytes() / 1e6, 2),
+        }
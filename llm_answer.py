@@ -1,56 +1,63 @@
-import requests
-import json
+import time
+
+from ollama_client import get_client
+
+
+def stream_generate(prompt, llm_model, options=None):
+    """
+    Yield Ollama /api/generate output as it is produced:
+    {"type": "token", "token": ...} per chunk, then one
+    {"type": "done", "answer", "ttft_s", "tokens", "tokens_per_s", "total_s"}.
+    """
+    start = time.perf_counter()
+    ttft = None
+    chunks = []
+    data = {}
+
+    for data in get_client().generate_stream(llm_model, prompt, options=options):
+        token = data.get("response", "")
+        if token:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            chunks.append(token)
+            yield {"type": "token", "token": token}
+
+    total = time.perf_counter() - start
+    # Ollama's own counters when present, else what we saw on the wire
+    tokens = data.get("eval_count", len(chunks))
+    if data.get("eval_duration"):
+        tokens_per_s = tokens / (data["eval_duration"] / 1e9)
+    else:
+        tokens_per_s = tokens / max(total - (ttft or 0.0), 1e-9)
+
+    yield {
+        "type": "done",
+        "answer": "".join(chunks).strip(),
+        "ttft_s": round(ttft if ttft is not None else total, 3),
+        "tokens": tokens,
+        "tokens_per_s": round(tokens_per_s, 1),
+        "total_s": round(total, 3)
+    }
+
+
+def stream_local_llm(user_query, llm_model):
+    """Plain (non-RAG) answer as stream_generate() events."""
+    return stream_generate(create_prompt(user_query), llm_model)
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
 
 def ask_local_llm(user_query, llm_model, streaming = False):
     prompt = create_prompt(user_query)
 
     if streaming == True:
-        return "The streaming this feature is currently unavailable!\n Please continue with stream option off until we fix issue in next update!"
-        # response = requests.post(
-        #     OLLAMA_URL,
-        #     json={
-        #         "model": llm_model,
-        #         "prompt": prompt,
-        #         "stream": True,
-        #         "options": {
-        #             "temperature": 0.2,
-        #             "top_p": 0.9
-        #         }
-        #     },
-        #     stream=True,
-        #     timeout=300
-        # )
-        #
-        # response.raise_for_status()
-        #
-        # print("\n🧠 Answer (streaming):\n")
-        #
-        # full_answer = ""
-        #
-        # for line in response.iter_lines():
-        #     if not line:
-        #         continue
-        #
-        #     data = json.loads(line.decode("utf-8"))
-        #
-        #     token = data.get("response", "")
-        #     print(token, end="", flush=True)
-        #     full_answer += token
-        #
-        #     if data.get("done"):
-        #         break
+        print("\n🧠 Answer (streaming):\n")
+        for event in stream_generate(prompt, llm_model):
+            if event["type"] == "token":
+                print(event["token"], end="", flush=True)
+        print()
+        # Same shape as the non-streaming Ollama response
+        return {"response": event["answer"]}
     else:
-        r = requests.post("http://localhost:11434/api/generate", json={
-            # "model": "deepseek-r1",
-            "model": llm_model,
-            "prompt": prompt,
-            "stream": False
-        })
-
-        response = r.json()
-        return response
+        return get_client().generate(llm_model, prompt)
 
 
 
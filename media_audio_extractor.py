@@ -1,10 +1,29 @@
-# Converts videos to mp3
+# Converts videos to 16 kHz mono audio for Whisper
+import os
+import json
+import time
 import subprocess
 import re
 import unicodedata
 import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+# Whisper's input format; anything richer is thrown away when it loads the file
+SAMPLE_RATE = 16000
+
+# Extra ffmpeg output options per container
+CODEC_ARGS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "mp3": ["-c:a", "libmp3lame", "-q:a", "4"],
+}
+
+MANIFEST_NAME = "conversions.json"
+
 # VIDEO_DIR = Path("src/video")
 # AUDIO_DIR = Path("src/audio")
 #
@@ -40,15 +59,152 @@ def name_list(files):
     return {file.name: convert_name(file) for file in files}
 
 
-def format_converter(file_map, VIDEO_DIR, AUDIO_DIR, output_format="mp3"):
-    for original, renamed in file_map.items():
-        input_path = VIDEO_DIR / original
-        output_path = AUDIO_DIR / f"{renamed}.{output_format}"
+def _load_manifest(path):
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, path):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _is_up_to_date(input_path, output_path, entry):
+    """
+    True if output_path was converted from the current content of
+    input_path. size/mtime matching the manifest avoids hashing at all;
+    otherwise the source is hashed (a touched but unchanged file is
+    still skipped).
+    """
+    if entry is None or not output_path.exists():
+        return False
+    stat = input_path.stat()
+    if entry["size"] != stat.st_size:
+        return False
+    if entry["mtime"] == stat.st_mtime:
+        return True
+    if entry["sha256"] != _sha256(input_path):
+        return False
+    entry["mtime"] = stat.st_mtime
+    return True
+
+
+def _convert(input_path, output_path, output_format):
+    # Written under a temporary name so an interrupted run never leaves a
+    # truncated file that looks converted
+    tmp_path = output_path.with_name(f"{output_path.stem}.part{output_path.suffix}")
+    start = time.perf_counter()
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+         "-i", str(input_path), "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+         *CODEC_ARGS.get(output_format, []), str(tmp_path)],
+        check=True, capture_output=True, text=True
+    )
+    os.replace(tmp_path, output_path)
+    return time.perf_counter() - start
+
+
+def format_converter(file_map, VIDEO_DIR, AUDIO_DIR, output_format="wav", workers=None):
+    """
+    Convert every file in file_map to 16 kHz mono audio in AUDIO_DIR with
+    up to `workers` ffmpeg processes at once. Outputs whose source has
+    not changed since the last conversion (see MANIFEST_NAME) are skipped.
+    Returns {"converted": [...], "skipped": [...], "failed": [...]}.
+    """
+    VIDEO_DIR, AUDIO_DIR = Path(VIDEO_DIR), Path(AUDIO_DIR)
+    manifest_path = AUDIO_DIR / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    workers = workers or os.cpu_count() or 1
+    result = {"converted": [], "skipped": [], "failed": []}
+    start = time.perf_counter()
+
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for original, renamed in file_map.items():
+            input_path = VIDEO_DIR / original
+            output_name = f"{renamed}.{output_format}"
+            output_path = AUDIO_DIR / output_name
+
+            if _is_up_to_date(input_path, output_path, manifest.get(output_name)):
+                result["skipped"].append(original)
+                continue
+
+            jobs[pool.submit(_convert, input_path, output_path, output_format)] = (
+                original, input_path, output_name
+            )
+
+        for future, (original, input_path, output_name) in jobs.items():
+            try:
+                seconds = future.result()
+            except subprocess.CalledProcessError as e:
+                result["failed"].append(original)
+                print(f"❌ {original}: ffmpeg failed ({e.stderr.strip()[-300:]})")
+                continue
+
+            stat = input_path.stat()
+            manifest[output_name] = {
+                "source": original,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": _sha256(input_path)
+            }
+            result["converted"].append(original)
+            print(f"  🎞️ {original} → {output_name} in {seconds:.1f}s")
+
+    _save_manifest(manifest, manifest_path)
+    print(f"✅ Converted {len(result['converted'])}, skipped {len(result['skipped'])} unchanged, "
+          f"{len(result['failed'])} failed in {time.perf_counter() - start:.1f}s")
+    return result
+
+
+def decode_audio(path, sample_rate=SAMPLE_RATE):
+    """
+    Decode any audio/video file straight to a float32 mono array (what
+    whisper.load_audio returns) through an ffmpeg pipe, without writing
+    an intermediate file.
+    """
+    proc = subprocess.run(
+        ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0",
+         "-i", str(path), "-vn", "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True, check=True
+    )
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
 
-        subprocess.run(
-            ["ffmpeg", "-i", str(input_path), str(output_path)],
-            check=True
-        )
 
+def iter_decoded_audio(paths, workers=2):
+    """
+    Yield (path, samples) in input order while up to 2*workers files are
+    decoded ahead. A file that cannot be decoded yields its exception in
+    place of the samples.
+    """
+    paths = iter(paths)
+    window = deque()
 
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def fill():
+            while len(window) < 2 * workers:
+                path = next(paths, None)
+                if path is None:
+                    return
+                window.append((path, pool.submit(decode_audio, path)))
 
+        fill()
+        while window:
+            path, future = window.popleft()
+            fill()
+            try:
+                yield path, future.result()
+            except Exception as e:
+                yield path, e
@@ -0,0 +1,187 @@
+import json
+import mmap
+import os
+
+import numpy as np
+
+# Long text fields stored once in a shared, deduplicated text table;
+# the column itself only holds the table row.
+TEXT_COLUMNS = ("paragraph_text", "context_text")
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_blob(path, chunks):
+    """Write byte chunks back to back plus an int64 offsets array (n + 1)."""
+    offsets = np.zeros(len(chunks) + 1, dtype="int64")
+    with open(path + ".data", "wb") as f:
+        for i, chunk in enumerate(chunks):
+            f.write(chunk)
+            offsets[i + 1] = offsets[i] + len(chunk)
+    np.save(path + ".offsets.npy", offsets)
+
+
+class _Blob:
+    """Read side of _write_blob: memory-mapped, sliced on demand."""
+
+    def __init__(self, path):
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        self._file = open(path + ".data", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __getitem__(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._data[start:end]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def write_columnar(records, path, text_columns=TEXT_COLUMNS):
+    """
+    Write records as one file pair per field (JSON-encoded values + row
+    offsets). A field missing from a record is an empty slice. Text fields
+    in text_columns go to a shared table so repeated paragraphs are
+    stored once.
+    """
+    os.makedirs(path, exist_ok=True)
+    columns = list(dict.fromkeys(key for r in records for key in r))
+
+    text_ids = {}
+    for name in columns:
+        chunks = []
+        for r in records:
+            if name not in r:
+                chunks.append(b"")
+                continue
+            value = r[name]
+            if name in text_columns:
+                value = text_ids.setdefault(value, len(text_ids))
+            chunks.append(_encode(value))
+        _write_blob(os.path.join(path, f"col.{name}"), chunks)
+
+    _write_blob(os.path.join(path, "texts"), [t.encode("utf-8") for t in text_ids])
+
+    with open(os.path.join(path, "columns.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "n_rows": len(records),
+            "columns": columns,
+            "text_columns": [c for c in columns if c in text_columns],
+            "n_texts": len(text_ids)
+        }, f, indent=2)
+
+
+class ColumnarMetadata:
+    """
+    Read-only, lazily decoded view of metadata written by write_columnar().
+    Indexing decodes just that row, so a search only pays for the rows it
+    returns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "columns.json"), "r", encoding="utf-8") as f:
+            schema = json.load(f)
+
+        self.n_rows = schema["n_rows"]
+        self.columns = schema["columns"]
+        self.text_columns = set(schema["text_columns"])
+
+        self._blobs = {name: _Blob(os.path.join(path, f"col.{name}")) for name in self.columns}
+        self._texts = _Blob(os.path.join(path, "texts"))
+        self._text_cache = {}
+
+    def __len__(self):
+        return self.n_rows
+
+    def text(self, text_id):
+        # Decoded texts are shared, so materialized rows don't duplicate them
+        text = self._text_cache.get(text_id)
+        if text is None:
+            text = self._texts[text_id].decode("utf-8")
+            self._text_cache[text_id] = text
+        return text
+
+    def value(self, i, name):
+        raw = self._blobs[name][i]
+        if not raw:
+            return None
+        value = json.loads(raw)
+        if name in self.text_columns:
+            value = self.text(value)
+        return value
+
+    def row(self, i, columns=None):
+        if i < 0:
+            i += self.n_rows
+        if not 0 <= i < self.n_rows:
+            raise IndexError(i)
+
+        record = {}
+        for name in columns or self.columns:
+            raw = self._blobs[name][i]
+            if raw:
+                value = json.loads(raw)
+                record[name] = self.text(value) if name in self.text_columns else value
+        return record
+
+    def __getitem__(self, i):
+        return self.row(int(i))
+
+    def __iter__(self):
+        for i in range(self.n_rows):
+            yield self.row(i)
+
+    def column(self, name):
+        """All values of one field (None where missing)."""
+        if name not in self._blobs:
+            return [None] * self.n_rows
+        return [self.value(i, name) for i in range(self.n_rows)]
+
+    def close(self):
+        for blob in self._blobs.values():
+            blob.close()
+        self._texts.close()
+
+
+def write_paragraphs(paragraphs, path):
+    """paragraph_id -> text table, stored once however many records share it."""
+    os.makedirs(path, exist_ok=True)
+    ids = list(paragraphs)
+    with open(os.path.join(path, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    _write_blob(os.path.join(path, "texts"), [paragraphs[pid].encode("utf-8") for pid in ids])
+
+
+class ParagraphTable:
+    """Read-only, memory-mapped view of a table written by write_paragraphs()."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "ids.json"), "r", encoding="utf-8") as f:
+            self._rows = {pid: i for i, pid in enumerate(json.load(f))}
+        self._texts = _Blob(os.path.join(path, "texts"))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, paragraph_id):
+        return paragraph_id in self._rows
+
+    def get(self, paragraph_id, default=None):
+        row = self._rows.get(paragraph_id)
+        if row is None:
+            return default
+        return self._texts[row].decode("utf-8")
+
+    def items(self):
+        for pid, row in self._rows.items():
+            yield pid, self._texts[row].decode("utf-8")
+
+    def close(self):
+        self._texts.close()
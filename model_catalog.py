@@ -0,0 +1,127 @@
+import threading
+import time
+
+from ollama_client import get_client
+
+# Model families that only produce embeddings, for servers whose
+# /api/show does not report "capabilities" yet
+EMBEDDING_FAMILIES = {"bert", "nomic-bert"}
+
+
+class ModelCatalog:
+    """
+    Installed Ollama models from /api/tags, cached for ttl seconds.
+
+    A stale list is returned immediately while a background thread
+    fetches a fresh one, so page loads never wait on Ollama after the
+    first. When Ollama is unreachable the previous list (or an empty one)
+    is kept for only retry_after seconds before the next background
+    attempt. Capabilities ("completion", "embedding", ...) come from
+    /api/show and are cached per model digest.
+    """
+
+    def __init__(self, client=None, ttl=60, retry_after=5):
+        self.client = client or get_client()
+        self.ttl = ttl
+        self.retry_after = retry_after
+
+        self._models = None
+        self._fetched_at = 0.0
+        self._capabilities = {}  # digest -> list of capabilities
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def _capabilities_of(self, model):
+        digest = model.get("digest") or model["name"]
+        capabilities = self._capabilities.get(digest)
+        if capabilities is not None:
+            return capabilities
+
+        details = model.get("details") or {}
+        try:
+            info = self.client.show(model["name"])
+            capabilities = info.get("capabilities")
+            details = info.get("details") or details
+        except Exception as e:
+            print(f"⚠️ Could not read capabilities of {model['name']}: {e}")
+            capabilities = None
+
+        if not capabilities:
+            families = set(details.get("families") or []) | {details.get("family")}
+            capabilities = ["embedding"] if families & EMBEDDING_FAMILIES else ["completion"]
+
+        self._capabilities[digest] = capabilities
+        return capabilities
+
+    def _fetch(self):
+        models = []
+        # No retries: a page load may be waiting, and the next refresh is the retry
+        for model in self.client.tags(max_retries=0).get("models", []):
+            models.append({
+                "name": model["name"],
+                "size": model.get("size"),
+                "modified_at": model.get("modified_at"),
+                "capabilities": self._capabilities_of(model)
+            })
+        return models
+
+    def refresh(self):
+        """Fetch the list now; keeps the previous one if Ollama is unreachable."""
+        try:
+            models = self._fetch()
+        except Exception as e:
+            print("Error fetching models:", e)
+            with self._lock:
+                self._models = self._models or []
+                # Stale again after retry_after seconds rather than ttl
+                self._fetched_at = time.monotonic() - self.ttl + self.retry_after
+            return self._models
+        finally:
+            self._refreshing = False
+
+        with self._lock:
+            self._models = models
+            self._fetched_at = time.monotonic()
+        return models
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def models(self):
+        """All installed models (name, size, modified_at, capabilities)."""
+        if self._models is None:
+            return self.refresh()
+        if time.monotonic() - self._fetched_at > self.ttl:
+            self._refresh_in_background()
+        return self._models
+
+    def names(self, capability=None, exclude=None):
+        return [
+            m["name"] for m in self.models()
+            if (capability is None or capability in m["capabilities"])
+            and (exclude is None or exclude not in m["capabilities"])
+        ]
+
+    def chat_models(self):
+        """Models that can answer questions (everything but embedding-only models)."""
+        return self.names(exclude="embedding")
+
+    def embedding_models(self):
+        return self.names(capability="embedding")
+
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Process-wide catalog shared by the web app and the terminal UI."""
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = ModelCatalog()
+        return _default_catalog
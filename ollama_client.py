@@ -0,0 +1,231 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+# (connect, read) timeouts in seconds. For streams the read timeout is the
+# longest gap allowed between two chunks, not the whole answer.
+DEFAULT_TIMEOUTS = {
+    "embed": (5, 300),
+    "generate": (5, 600),
+    "generate_stream": (5, 120),
+    "tags": (2, 10),
+    "show": (2, 10),
+}
+
+# Worth another try: overload and proxies restarting. A 500 usually means
+# the input itself is bad, so it is returned to the caller straight away.
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+def resolve_host(host=None):
+    """
+    Base URL of the Ollama server: host, else $OLLAMA_HOST, else
+    127.0.0.1:11434. Accepts the same forms as OLLAMA_HOST
+    ("0.0.0.0:11434", "myhost", "https://myhost:443").
+    """
+    host = (host or os.environ.get("OLLAMA_HOST") or DEFAULT_HOST).strip().rstrip("/")
+    scheme, sep, rest = host.partition("://")
+    if not sep:
+        # Bare host[:port]; like Ollama, the port defaults to 11434 only here
+        scheme, rest = "http", host
+        name, slash, path = rest.partition("/")
+        if ":" not in name:
+            rest = f"{name}:11434{slash}{path}"
+    if rest.startswith("0.0.0.0"):
+        # A server bind address, not something to connect to
+        rest = "127.0.0.1" + rest[len("0.0.0.0"):]
+    return f"{scheme}://{rest}"
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+class OllamaClient:
+    """
+    One pooled keep-alive session for every Ollama call (embeddings,
+    answers, model listing), with per-endpoint timeouts, retries with
+    jittered backoff and at most max_concurrency requests per model in
+    flight; further callers wait here instead of queueing on the server.
+
+    Latency of every call is kept for metrics(); add_metrics_hook()
+    receives each one as (endpoint, model, seconds, ok).
+    """
+
+    def __init__(self, host=None, timeouts=None, max_retries=2, backoff=0.5,
+                 max_concurrency=None, pool_maxsize=16, history=1000):
+        self.host = resolve_host(host)
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Matches the server's parallel slots when it is configured
+        self.max_concurrency = max_concurrency or int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+        self._latencies = defaultdict(lambda: deque(maxlen=history))
+        self._counts = defaultdict(lambda: {"requests": 0, "errors": 0, "retries": 0})
+        self._metrics_lock = threading.Lock()
+        self._hooks = []
+
+    def url(self, endpoint):
+        return f"{self.host}/api/{endpoint}"
+
+    # METRICS
+    def add_metrics_hook(self, hook):
+        """hook(endpoint, model, seconds, ok), called after every request."""
+        self._hooks.append(hook)
+
+    def _record(self, endpoint, model, seconds, ok):
+        with self._metrics_lock:
+            self._latencies[endpoint].append(seconds)
+            self._counts[endpoint]["requests"] += 1
+            if not ok:
+                self._counts[endpoint]["errors"] += 1
+        for hook in self._hooks:
+            hook(endpoint, model, seconds, ok)
+
+    def metrics(self):
+        """Per endpoint: request/error/retry counts and p50/p90/p99 latency in ms."""
+        with self._metrics_lock:
+            result = {}
+            for endpoint, counts in self._counts.items():
+                values = sorted(self._latencies[endpoint])
+                result[endpoint] = dict(counts)
+                for q in (50, 90, 99):
+                    value = _percentile(values, q)
+                    result[endpoint][f"p{q}_ms"] = None if value is None else round(value * 1000, 1)
+            return result
+
+    # TRANSPORT
+    def _slot(self, model):
+        with self._slots_lock:
+            slot = self._slots.get(model)
+            if slot is None:
+                slot = self._slots[model] = threading.BoundedSemaphore(self.max_concurrency)
+            return slot
+
+    def _sleep_before_retry(self, endpoint, attempt):
+        with self._metrics_lock:
+            self._counts[endpoint]["retries"] += 1
+        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def _request(self, method, endpoint, payload=None, stream=False, timeout_key=None, max_retries=None):
+        """Send with retries (max_retries overrides the client's); returns a successful Response or raises."""
+        timeout = self.timeouts[timeout_key or endpoint]
+        if max_retries is None:
+            max_retries = self.max_retries
+
+        for attempt in range(max_retries + 1):
+            last_attempt = attempt == max_retries
+            try:
+                response = self.session.request(
+                    method, self.url(endpoint), json=payload, stream=stream, timeout=timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                self._sleep_before_retry(timeout_key or endpoint, attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                response.close()
+                self._sleep_before_retry(timeout_key or endpoint, attempt)
+                continue
+
+            if response.status_code != 200:
+                # Ollama puts the reason in the body; keep it in the error
+                raise requests.HTTPError(
+                    f"{response.status_code} from {endpoint}: {response.text[:500]}", response=response
+                )
+            return response
+
+    def _call(self, endpoint, payload, timeout_key=None):
+        model = payload.get("model")
+        start = time.perf_counter()
+        ok = False
+        try:
+            with self._slot(model):
+                response = self._request("POST", endpoint, payload, timeout_key=timeout_key)
+                data = response.json()
+            ok = True
+            return data
+        finally:
+            self._record(timeout_key or endpoint, model, time.perf_counter() - start, ok)
+
+    # API
+    def embed(self, model, texts):
+        """/api/embed response for a list of texts."""
+        return self._call("embed", {"model": model, "input": texts})
+
+    def generate(self, model, prompt, options=None, **extra):
+        """Complete (non-streamed) /api/generate response."""
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}, **extra}
+        return self._call("generate", payload)
+
+    def generate_stream(self, model, prompt, options=None, **extra):
+        """
+        Yield /api/generate chunks (dicts) as Ollama produces them. The
+        model's concurrency slot is held until the stream is finished or
+        the generator is closed.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {}, **extra}
+        start = time.perf_counter()
+        ok = False
+        try:
+            with self._slot(model):
+                with self._request("POST", "generate", payload, stream=True,
+                                   timeout_key="generate_stream") as response:
+                    # Read to the end rather than stopping at "done", so the
+                    # connection goes back to the pool
+                    for line in response.iter_lines():
+                        if line:
+                            yield json.loads(line)
+            ok = True
+        finally:
+            self._record("generate_stream", model, time.perf_counter() - start, ok)
+
+    def tags(self, max_retries=None):
+        """Locally installed models (/api/tags)."""
+        start = time.perf_counter()
+        ok = False
+        try:
+            data = self._request("GET", "tags", max_retries=max_retries).json()
+            ok = True
+            return data
+        finally:
+            self._record("tags", None, time.perf_counter() - start, ok)
+
+    def show(self, model):
+        """Model details (/api/show), including "capabilities" on newer servers."""
+        return self._call("show", {"model": model})
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client shared by the vector store and the answer modules."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OllamaClient()
+        return _default_client
@@ -1,30 +1,32 @@
-import requests
-
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
+from context_packer import pack_context
+from ollama_client import get_client
 
 
 def ask_llm_with_context(
     user_query: str,
     matches: list,
-    llm_model: str = "llama3:8b"
+    llm_model: str = "llama3:8b",
+    text_of=None
 ):
     # ---------------- BUILD CONTEXT ----------------
+    # Deduplicated passages, best first, within the model's token budget
+    passages = pack_context(matches, llm_model, text_of=text_of)
+
     context_blocks = []
     source_map = []
 
-    for i, r in enumerate(matches, 1):
-        text = r.get("paragraph_text", r["embedding_text"])
-        source = r.get("source_name", "unknown")
+    for i, p in enumerate(passages, 1):
+        source = p["source_name"]
 
         # Handle document vs video metadata
-        if "page" in r:
-            source_info = f"{source} (page {r['page']})"
-        elif "start_time" in r and "end_time" in r:
-            source_info = f"{source} (timestamp {r['start_time']}s–{r['end_time']}s)"
+        if "page" in p:
+            source_info = f"{source} (page {p['page']})"
+        elif "start_time" in p and "end_time" in p:
+            source_info = f"{source} (timestamp {p['start_time']}s–{p['end_time']}s)"
         else:
             source_info = source
 
-        context_blocks.append(f"[{i}] {text}")
+        context_blocks.append(f"[{i}] {p['text']}")
         source_map.append(f"[{i}] {source_info}")
 
     context_text = "\n\n".join(context_blocks)
@@ -62,19 +64,13 @@ Sources:
 """
 
     # ---------------- CALL OLLAMA ----------------
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": llm_model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.2,
-                "top_p": 0.9
-            }
-        },
-        timeout=300
+    response = get_client().generate(
+        llm_model,
+        prompt,
+        options={
+            "temperature": 0.2,
+            "top_p": 0.9
+        }
     )
 
-    response.raise_for_status()
-    return response.json()["response"].strip()
+    return response["response"].strip()
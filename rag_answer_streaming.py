@@ -1,8 +1,7 @@
-import requests
-import json
 import math
 
-OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
+from context_packer import pack_context
+from llm_answer import stream_generate
 
 
 def compute_confidence(matches):
@@ -25,27 +24,35 @@ def compute_confidence(matches):
     return round(confidence * 100, 2)
 
 
-def ask_llm_with_context_streaming(
+def stream_llm_with_context(
     user_query: str,
     matches: list,
-    llm_model: str = "llama3.2:3b"
+    llm_model: str = "llama3.2:3b",
+    text_of=None
 ):
+    """
+    RAG answer as events, without printing: {"type": "sources",
+    "sources", "confidence"} first, then stream_generate()'s token and
+    done events.
+    """
     # ---------------- BUILD CONTEXT ----------------
+    # Deduplicated passages, best first, within the model's token budget
+    passages = pack_context(matches, llm_model, text_of=text_of)
+
     context_blocks = []
     source_map = []
 
-    for i, r in enumerate(matches, 1):
-        text = r.get("paragraph_text", r["embedding_text"])
-        source = r.get("source_name", "unknown")
+    for i, p in enumerate(passages, 1):
+        source = p["source_name"]
 
-        if "page" in r:
-            source_info = f"{source} (page {r['page']})"
-        elif "start_time" in r and "end_time" in r:
-            source_info = f"{source} ({r['start_time']}s–{r['end_time']}s)"
+        if "page" in p:
+            source_info = f"{source} (page {p['page']})"
+        elif "start_time" in p and "end_time" in p:
+            source_info = f"{source} ({p['start_time']}s–{p['end_time']}s)"
         else:
             source_info = source
 
-        context_blocks.append(f"[{i}] {text}")
+        context_blocks.append(f"[{i}] {p['text']}")
         source_map.append(f"[{i}] {source_info}")
 
     context_text = "\n\n".join(context_blocks)
@@ -73,40 +80,34 @@ RULES:
     # ---------------- CONFIDENCE ----------------
     confidence = compute_confidence(matches)
 
+    yield {"type": "sources", "sources": source_map, "confidence": confidence}
+
     # ---------------- STREAM REQUEST ----------------
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": llm_model,
-            "prompt": prompt,
-            "stream": True,
-            "options": {
-                "temperature": 0.2,
-                "top_p": 0.9
-            }
-        },
-        stream=True,
-        timeout=300
+    yield from stream_generate(
+        prompt,
+        llm_model,
+        options={
+            "temperature": 0.2,
+            "top_p": 0.9
+        }
     )
 
-    response.raise_for_status()
 
+def ask_llm_with_context_streaming(
+    user_query: str,
+    matches: list,
+    llm_model: str = "llama3.2:3b",
+    text_of=None
+):
+    """Terminal version: prints tokens as they arrive, then the sources."""
     print("\n🧠 Answer (streaming):\n")
 
-    full_answer = ""
-
-    for line in response.iter_lines():
-        if not line:
-            continue
-
-        data = json.loads(line.decode("utf-8"))
-
-        token = data.get("response", "")
-        print(token, end="", flush=True)
-        full_answer += token
-
-        if data.get("done"):
-            break
+    for event in stream_llm_with_context(user_query, matches, llm_model, text_of):
+        if event["type"] == "sources":
+            source_map = event["sources"]
+            confidence = event["confidence"]
+        elif event["type"] == "token":
+            print(event["token"], end="", flush=True)
 
     # ---------------- SOURCES ----------------
     print("\n\nSources:")
@@ -116,7 +117,7 @@ RULES:
     print(f"\n📊 Confidence Score: {confidence}%")
 
     return {
-        "answer": full_answer.strip(),
+        "answer": event["answer"],
         "confidence": confidence,
         "sources": source_map
     }
@@ -0,0 +1,134 @@
+import copy
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Broadcast:
+    """Events of one producer, replayed to every subscriber from the start."""
+
+    def __init__(self):
+        self.events = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def publish(self, event):
+        with self.cond:
+            self.events.append(event)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.finished = True
+            self.error = error
+            self.cond.notify_all()
+
+    def subscribe(self):
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.events) and not self.finished:
+                    self.cond.wait()
+                batch = self.events[i:]
+                i = len(self.events)
+                finished, error = self.finished, self.error
+
+            for event in batch:
+                # Consumers may annotate their events; each gets its own copy
+                yield copy.copy(event)
+
+            if finished and i >= len(self.events):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """
+    In-flight deduplication: concurrent calls with the same key share one
+    execution. do() is for plain calls; stream() fans one generator's
+    events out to every concurrent subscriber, late joiners included.
+    Keys are forgotten as soon as the shared call finishes, so later
+    requests run (or hit a cache) normally.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0  # calls that actually ran
+        self.coalesced = 0   # calls that joined one already running
+
+    def _join(self, key, factory):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._calls[key] = factory()
+            self.executions += 1
+            return call, True
+
+    def _forget(self, key):
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key, fn, *args, **kwargs):
+        call, leader = self._join(key, _Call)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._forget(key)
+            call.done.set()
+        return call.result
+
+    def stream(self, key, make_events):
+        """
+        Iterate make_events() once per key and yield its events to every
+        caller. It runs in its own thread, so one client disconnecting
+        does not stop the stream for the others.
+        """
+        broadcast, leader = self._join(key, _Broadcast)
+
+        if leader:
+            def produce():
+                error = None
+                try:
+                    for event in make_events():
+                        broadcast.publish(event)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._forget(key)
+                    broadcast.finish(error)
+
+            threading.Thread(target=produce, daemon=True).start()
+
+        return broadcast.subscribe()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        total = self.executions + self.coalesced
+        return {
+            "in_flight": in_flight,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -47,6 +47,11 @@ async function ask() {
   const rag = document.getElementById("rag").checked;
   const streaming = document.getElementById("stream").checked;
 
+  if (streaming) {
+    await askStreaming(query, model, rag);
+    return;
+  }
+
   try {
     const res = await fetch("/ask", {
       method: "POST",
@@ -77,6 +82,76 @@ async function ask() {
   }
 }
 
+/* Streaming: read server-sent events from /ask/stream and append tokens as they arrive */
+async function askStreaming(query, model, rag) {
+  const content = addMessage("", "ai");
+  let sources = [];
+
+  const handlers = {
+    meta: (data) => {
+      document.getElementById("ai-name").textContent = data.ai_name;
+    },
+    sources: (data) => {
+      sources = data.sources;
+    },
+    token: (data) => {
+      content.textContent += data.token;
+      chat.scrollTop = chat.scrollHeight;
+    },
+    done: (data) => {
+      if (sources.length) {
+        content.textContent += "\n\nSources:\n" + sources.map((s) => "- " + s).join("\n");
+      }
+      console.log(`TTFT ${data.ttft_s}s, ${data.tokens_per_s} tokens/s`);
+    },
+    error: (data) => {
+      content.textContent += "\n❌ " + data.message;
+    }
+  };
+
+  try {
+    const res = await fetch("/ask/stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json"
+      },
+      body: JSON.stringify({
+        query: query,
+        model: model,
+        rag: rag
+      })
+    });
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+
+        let event = "message";
+        let data = "";
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (handlers[event] && data) handlers[event](JSON.parse(data));
+      }
+    }
+  } catch (err) {
+    content.textContent += "\n❌ Error connecting to server";
+    console.error(err);
+  }
+}
+
 queryInput.addEventListener("keydown", (e) => {
   if (e.key === "Enter" && !e.shiftKey) {
     e.preventDefault();
@@ -97,7 +172,7 @@ function addMessage(text, type) {
   copyBtn.innerHTML = "📋";
 
   copyBtn.onclick = () => {
-    navigator.clipboard.writeText(text);
+    navigator.clipboard.writeText(content.textContent);
     copyBtn.innerHTML = "✓";
     setTimeout(() => (copyBtn.innerHTML = "📋"), 1200);
   };
@@ -107,4 +182,5 @@ function addMessage(text, type) {
 
   chat.appendChild(message);
   chat.scrollTop = chat.scrollHeight;
+  return content;
 }
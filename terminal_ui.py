@@ -1,12 +1,13 @@
 
-import subprocess
+import os
 from pathlib import Path
 from media_audio_extractor import name_list, format_converter
 from text_chunker import WhisperTranscriber
-from vector_database import BGEVectorStore
+from vector_database import BGEVectorStore, open_vector_store_for_ingest
 from rag_answer import ask_llm_with_context
 from rag_answer_streaming import ask_llm_with_context_streaming
 from llm_answer import ask_local_llm
+from model_catalog import get_catalog
 
 
 
@@ -20,59 +21,44 @@ db = BGEVectorStore(index_path="src/vector_db")
 
 
 
-def get_local_models():
-    try:
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True
-        )
-        lines = result.stdout.strip().split("\n")[1:]
-        return [line.split()[0] for line in lines]
-    except Exception:
-        return []
-
-def video_to_mp3():
+def video_to_audio():
+    # 16 kHz mono WAV; unchanged videos are skipped on reruns. Videos can
+    # also be ingested directly: batched transcription pipes them from ffmpeg
     available_files = [f for f in VIDEO_DIR.iterdir() if f.is_file()]
     file_map = name_list(available_files)
-    format_converter(file_map, VIDEO_DIR, AUDIO_DIR, "mp3")
+    return format_converter(file_map, VIDEO_DIR, AUDIO_DIR, "wav")
 
 
-def text_chunking(path):
-    transcriber = WhisperTranscriber()
-    chunks = transcriber.ingest(path)
-    print(len(chunks))
-    return chunks
+def text_chunking(path, skip_file=None, transcriber=None):
+    transcriber = transcriber or WhisperTranscriber()
+    # Generator: records arrive file by file while embedding is running;
+    # text documents are parsed on every core
+    return transcriber.ingest(path, skip_file=skip_file, workers=os.cpu_count())
 
 
-def text_to_Embeddings(chunks):
-    vector_db = BGEVectorStore(model_name="bge-m3", dim=1024, index_path="src/vector_db")
+def text_to_Embeddings(chunks, vector_db=None, failed_files=()):
+    # Appends to the existing index instead of rebuilding it
+    if vector_db is None:
+        vector_db = open_vector_store_for_ingest(index_path="src/vector_db")
     vector_db.add_documents(chunks, batch_size=32)
+
+    # A file that failed part-way must be parsed again next time
+    for source_path in failed_files:
+        vector_db.file_manifest.pop(source_path, None)
+
     vector_db.save()
 
     print("Vector database saved")
 
 def get_local_models():
-    try:
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True
-        )
-        lines = result.stdout.strip().split("\n")[1:]
-        model_list = [line.split()[0] for line in lines]
-
-        if "bge-m3:latest" in model_list:
-            model_list.remove("bge-m3:latest")
-
-        return model_list
-    except Exception as e:
-        print("Error fetching models:", e)
-        return []
+    # Cached /api/tags listing; embedding-only models such as bge-m3 are left out
+    return get_catalog().chat_models()
 
 def import_and_process_files(path):
-    split_data = text_chunking(path)
-    text_to_Embeddings(split_data)
+    vector_db = open_vector_store_for_ingest(index_path="src/vector_db")
+    transcriber = WhisperTranscriber()
+    split_data = text_chunking(path, skip_file=vector_db.is_unchanged, transcriber=transcriber)
+    text_to_Embeddings(split_data, vector_db, failed_files=transcriber.failed_files)
 
 def cmd_ui():
     print("=" * 50)
@@ -132,29 +118,28 @@ def cmd_ui():
                     score_threshold=0.35
                 )
 
-                # Remove useless short chunks
-                matches = [
-                    r for r in matches
-                    if len(r["embedding_text"].split()) >= 6
-                ]
-
                 print(rag_model)
                 if rag_model == True:
                     if not matches:
                         print("No relevant data found")
                     else:
+                        # Paragraph/context text is only looked up for the passages we send
+                        db.resolve_texts(matches)
+
                         if answer_streaming == True:
                             answer = ask_llm_with_context_streaming(
                                 user_query=user_query,
                                 matches=matches,
-                                llm_model=sel_model
+                                llm_model=sel_model,
+                                text_of=db.paragraph_text
                             )
 
                         else:
                             answer = ask_llm_with_context(
                                 user_query=user_query,
                                 matches=matches,
-                                llm_model=sel_model
+                                llm_model=sel_model,
+                                text_of=db.paragraph_text
                             )
                         print("\nFinal Answer:\n")
                         print(answer)
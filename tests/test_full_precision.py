@@ -0,0 +1,49 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import full_precision
+from full_precision import FullPrecisionVectors
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype("float32")
+
+
+def test_save_load_append_save(tmp_path, monkeypatch):
+    # Small chunks so the copy of the saved rows takes several passes
+    monkeypatch.setattr(full_precision, "CHUNK_ROWS", 4)
+    first, second = vectors(10), vectors(4, seed=1)
+
+    store = FullPrecisionVectors(8)
+    store.add(first)
+    store.save(str(tmp_path / "gen1.npy"))
+
+    loaded = FullPrecisionVectors.load(str(tmp_path / "gen1.npy"))
+    loaded.add(second)
+    loaded.save(str(tmp_path / "gen2.npy"))
+
+    reloaded = FullPrecisionVectors.load(str(tmp_path / "gen2.npy"))
+    assert len(reloaded) == 14
+    np.testing.assert_array_equal(reloaded.get(np.arange(14)), np.vstack([first, second]))
+
+
+def test_remove_then_append_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(full_precision, "CHUNK_ROWS", 3)
+    first, second = vectors(10), vectors(2, seed=1)
+
+    store = FullPrecisionVectors(8)
+    store.add(first)
+    store.save(str(tmp_path / "gen1.npy"))
+
+    loaded = FullPrecisionVectors.load(str(tmp_path / "gen1.npy"))
+    loaded.remove_ids([0, 5])
+    loaded.add(second)
+    loaded.save(str(tmp_path / "gen2.npy"))
+
+    reloaded = FullPrecisionVectors.load(str(tmp_path / "gen2.npy"))
+    expected = np.vstack([np.delete(first, [0, 5], axis=0), second])
+    np.testing.assert_array_equal(reloaded.get(np.arange(len(reloaded))), expected)
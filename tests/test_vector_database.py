@@ -0,0 +1,129 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import FakeOllamaServer, fake_embedding
+from embedding_cache import EmbeddingCache
+from vector_database import BGEVectorStore
+
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer(latency=0.0, per_text_latency=0.0) as server:
+        yield server
+
+
+def make_store(server, tmp_path, **kwargs):
+    return BGEVectorStore(ollama_url=server.embed_url, index_path=str(tmp_path / "db"),
+                          embedding_cache=EmbeddingCache(), **kwargs)
+
+
+def records(tmp_path, version, files=range(4), per_file=50):
+    for k in files:
+        source_path = str(tmp_path / f"file{k}.txt")
+        for i in range(per_file):
+            yield {
+                "embedding_text": f"{version} file {k} chunk {i} explains pointers and memory in C",
+                "source_type": "text",
+                "source_name": f"file{k}.txt",
+                "source_path": source_path,
+            }
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_reingest_removes_replaced_rows_once(server, tmp_path, index_type):
+    store = make_store(server, tmp_path, index_type=index_type)
+    store.add_documents(list(records(tmp_path, "old")))
+
+    calls = []
+    remove_ids = store._remove_ids
+    store._remove_ids = lambda ids: (calls.append(len(ids)), remove_ids(ids))
+
+    store.add_documents(list(records(tmp_path, "new", files=[0, 2, 3])))
+
+    # One removal pass for the three replaced files, not one per file
+    assert calls == [150]
+    texts = [r["embedding_text"] for r in store.metadata]
+    assert store.index.ntotal == store.lexical.n_docs == len(texts) == 200
+    assert sum(t.startswith("old") for t in texts) == 50
+    for t in texts[::25]:
+        assert store.search(t, top_k=1, lexical=False)[0]["embedding_text"] == t
+
+
+def test_unpruned_store_hides_junk_until_migrated(server, tmp_path):
+    from vector_database import migrate_legacy_store
+
+    texts = ["tiny", "12345", "a proper sentence about pointers with more than six words",
+             "another proper sentence about memory and pointers in C code"]
+    store = make_store(server, tmp_path)
+    store.index.add(store.embed_texts(texts)[0])
+    store.metadata = [{"embedding_text": t, "source_type": "text", "source_name": "j.txt"} for t in texts]
+    store.lexical.add(texts)
+    store.pruned = False  # as saved before ingestion filtered junk chunks
+    store.save()
+
+    queried = make_store(server, tmp_path)
+    queried.load(mmap=True)
+    hits = queried.search("tiny 12345 pointers", top_k=4)
+    assert sorted(r["vector_id"] for r in hits) == [2, 3]
+
+    migrate_legacy_store(str(tmp_path / "db"))
+    migrated = make_store(server, tmp_path)
+    migrated.load(mmap=True)
+    assert migrated.pruned and migrated.index.ntotal == 2
+
+
+def test_embed_batch_skips_only_the_rejected_text(tmp_path):
+    texts = [f"text number {i} about pointers" for i in range(16)]
+    texts[11] = "text number 11 with POISON in it"
+
+    with FakeOllamaServer(latency=0.0, per_text_latency=0.0, reject_texts=["POISON"]) as server:
+        store = make_store(server, tmp_path)
+        embeddings, kept = store.embed_batch(texts)
+        requests_made = server.httpd.embed_requests
+
+    assert kept == [i for i in range(16) if i != 11]
+    expected = np.array([fake_embedding(texts[i]) for i in kept])
+    np.testing.assert_allclose(embeddings, expected, atol=1e-6)
+    # Bisection: about 2*log2(16) requests, not one per text
+    assert requests_made <= 1 + 2 * 4
+
+
+def test_embed_batch_retries_an_overloaded_server(tmp_path):
+    texts = [f"text number {i} about pointers" for i in range(4)]
+
+    with FakeOllamaServer(latency=0.0, per_text_latency=0.0, fail_first=2) as server:
+        store = make_store(server, tmp_path)
+        store.client.backoff = 0.0
+        embeddings, kept = store.embed_batch(texts)
+
+    # 503 is retried by the client, never bisected
+    assert kept == [0, 1, 2, 3]
+    assert server.httpd.embed_requests == 3
+
+
+def test_embed_batch_raises_when_every_text_is_rejected(tmp_path):
+    with FakeOllamaServer(latency=0.0, per_text_latency=0.0, reject_texts=["POISON"]) as server:
+        store = make_store(server, tmp_path)
+        with pytest.raises(RuntimeError):
+            store.embed_batch(["POISON one", "POISON two"])
+
+
+def test_is_input_error():
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.HTTPError(response=response)
+
+    assert BGEVectorStore._is_input_error(http_error(400))
+    assert BGEVectorStore._is_input_error(http_error(500))
+    assert BGEVectorStore._is_input_error(ValueError("NaN detected"))
+    assert not BGEVectorStore._is_input_error(http_error(429))
+    assert not BGEVectorStore._is_input_error(http_error(503))
+    assert not BGEVectorStore._is_input_error(requests.ConnectionError())
+    assert not BGEVectorStore._is_input_error(requests.Timeout())
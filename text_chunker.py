@@ -1,83 +1,247 @@
 import os
-import whisper
-import fitz
-from docx import Document
-import nltk
-from nltk.tokenize import sent_tokenize
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import re
+
+import numpy as np
+
+from media_audio_extractor import SAMPLE_RATE, iter_decoded_audio
+
+# whisper (torch), fitz, docx and nltk are imported where they are first
+# needed, so query-only processes and text-only ingestion never load them
+
+AUDIO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mp3", ".wav")
+
+# Whisper works on 30 s of audio at a time
+WINDOW_SECONDS = 30
+
+# Pages per process-pool task when PDFs are parsed in parallel
+PDF_PAGES_PER_TASK = 16
+
+_sentence_splitter = None
+
+
+def _regex_sent_tokenize(text):
+    return re.split(r"(?<=[.!?])\s+", text)
+
+
+def get_sentence_splitter():
+    """
+    NLTK's punkt tokenizer when its data is installed, otherwise a simple
+    regex splitter. Checked once per process; never touches the network.
+    """
+    global _sentence_splitter
+    if _sentence_splitter is None:
+        try:
+            from nltk.tokenize import sent_tokenize
+            sent_tokenize("Resource check. Done.")  # LookupError if data is missing
+            _sentence_splitter = sent_tokenize
+        except (ImportError, LookupError):
+            print("⚠️ NLTK punkt data not found, using a simple sentence splitter. "
+                  "Install it once with: python -m nltk.downloader punkt punkt_tab")
+            _sentence_splitter = _regex_sent_tokenize
+    return _sentence_splitter
+
+
+# Process-wide Whisper models keyed by (model size, device, compute type),
+# so every transcriber (e.g. one per upload) shares one load
+_MODEL_REGISTRY = {}
+_MODEL_LOAD_SECONDS = {}
+_MODEL_LOCK = threading.Lock()
+
+
+def resolve_device(device="auto"):
+    """'auto' picks CUDA when available; a CUDA request falls back to CPU."""
+    try:
+        import torch
+        cuda_ok = torch.cuda.is_available()
+    except ImportError:
+        cuda_ok = False
+
+    if device in (None, "auto"):
+        return "cuda" if cuda_ok else "cpu"
+    if device.startswith("cuda") and not cuda_ok:
+        print(f"⚠️ {device} not available, using CPU for Whisper")
+        return "cpu"
+    return device
+
+
+def _quantize_int8(model):
+    """
+    Dynamically quantize Whisper's Linear layers to int8 (CPU).
+
+    Whisper uses its own whisper.model.Linear subclass, which
+    quantize_dynamic neither matches by type nor accepts in
+    Linear.from_float, so those layers are turned back into plain
+    nn.Linear first. The subclass only casts weights to the input dtype,
+    a no-op for fp32 on CPU.
+    """
+    import torch
+    import whisper
+
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    n_quantized = sum(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in model.modules())
+    if n_quantized == 0:
+        print("⚠️ int8: no Linear layers were quantized, running in fp32")
+    else:
+        print(f"🎙️ int8: quantized {n_quantized} Linear layers")
+    return model
+
+
+def get_whisper_model(model_size="medium", device="auto", compute_type="default"):
+    """
+    compute_type: "default" (fp16 on GPU, fp32 on CPU), "fp32", or "int8"
+    (dynamically quantized Linear layers, CPU only).
+    """
+    import whisper
+
+    device = resolve_device(device)
+    if compute_type == "int8" and device != "cpu":
+        compute_type = "default"  # torch int8 dynamic quantization is CPU-only
+
+    key = requested_key = (model_size, device, compute_type)
+
+    with _MODEL_LOCK:
+        model = _MODEL_REGISTRY.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        try:
+            model = whisper.load_model(model_size, device=device)
+        except RuntimeError as e:
+            if device == "cpu":
+                raise
+            # e.g. CUDA out of memory or a broken driver on this node
+            print(f"⚠️ Loading Whisper on {device} failed ({e}), falling back to CPU")
+            device = "cpu"
+            key = (model_size, device, compute_type)
+            model = _MODEL_REGISTRY.get(key) or whisper.load_model(model_size, device=device)
+
+        if compute_type == "int8":
+            model = _quantize_int8(model)
+
+        _MODEL_LOAD_SECONDS[key] = time.perf_counter() - start
+        # After a fallback, the GPU key maps to the CPU model so we don't retry
+        _MODEL_REGISTRY[key] = _MODEL_REGISTRY[requested_key] = model
+        print(f"🎙️ Whisper {model_size} ({compute_type}) loaded on {device} "
+              f"in {_MODEL_LOAD_SECONDS[key]:.1f}s")
+        return model
+
+
+def split_audio(audio, max_seconds=WINDOW_SECONDS, silence_rms=0.01,
+                frame_seconds=0.1, search_seconds=5):
+    """
+    Cut 16 kHz audio into windows of at most max_seconds. Each cut is made
+    at the quietest frame of the last search_seconds, so words are rarely
+    split, and windows with no frame louder than silence_rms are dropped.
+    Yields (offset_seconds, samples).
+    """
+    frame = int(SAMPLE_RATE * frame_seconds)
+    n_frames = -(-len(audio) // frame)
+    if n_frames == 0:
+        return
+
+    padded = np.zeros(n_frames * frame, dtype="float32")
+    padded[:len(audio)] = audio
+    rms = np.sqrt((padded.reshape(n_frames, frame) ** 2).mean(axis=1))
+
+    max_frames = int(round(max_seconds / frame_seconds))
+    search = int(round(search_seconds / frame_seconds))
+
+    start = 0
+    while start < n_frames:
+        end = start + max_frames
+        if end < n_frames:
+            # Cut after the quietest frame, the latest one on ties
+            tail = rms[end - search:end][::-1]
+            end -= int(np.argmin(tail))
+        else:
+            end = n_frames
 
-# Download once
-nltk.download("punkt", quiet=True)
-nltk.download('punkt_tab')
+        if rms[start:end].max() >= silence_rms:
+            yield round(start * frame_seconds, 2), audio[start * frame:end * frame]
+        start = end
 
-class WhisperTranscriber:
-    def __init__(self, device="cuda"):
-        # Use medium for speed + accuracy balance
-        self.whisper_model = whisper.load_model("medium", device)
 
-    #  COMMON 
-    def split_sentences(self, text):
-        return [s.strip() for s in sent_tokenize(text) if s.strip()]
+def paragraph_prefix(file_path):
+    """
+    File name plus a short hash of the absolute path, used to build
+    paragraph ids: same-named files in different folders must not share
+    entries in the store's paragraph table.
+    """
+    path = os.path.abspath(file_path)
+    return f"{os.path.basename(path)}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
 
-    #  AUDIO / VIDEO 
-    def extract_from_audio(self, file_path, window=1):
-        result = self.whisper_model.transcribe(file_path)
-        segments = result["segments"]
 
-        records = []
+def _failed_records(error):
+    raise error
+    yield
 
-        for idx, seg in enumerate(segments):
-            start_idx = max(0, idx - window)
-            end_idx = min(len(segments), idx + window + 1)
 
-            context_text = " ".join(
-                segments[i]["text"].strip() for i in range(start_idx, end_idx)
-            )
+class DocumentExtractor:
+    """
+    PDF / DOCX / TXT extraction and the ingest loop. Holds no model, so
+    it is cheap to create in every worker process.
+    """
 
-            records.append({
-                "embedding_text": seg["text"].strip(),
-                "context_text": context_text,
-                "start_time": round(segments[start_idx]["start"], 2),
-                "end_time": round(segments[end_idx - 1]["end"], 2),
-                "source_type": "audio",
-                "source_name": os.path.basename(file_path),
-                "segment_index": idx
-            })
-
-        return records
-
-    #  PDF 
-    def extract_from_pdf(self, file_path):
-        doc = fitz.open(file_path)
-        records = []
+    def __init__(self):
+        # Files the last ingest() could not finish; see ingest()
+        self.failed_files = []
 
-        for page_no, page in enumerate(doc, start=1):
-            blocks = page.get_text("blocks")
-
-            for block_idx, block in enumerate(blocks):
-                paragraph_text = block[4].strip()
-                if not paragraph_text:
-                    continue
-
-                sentences = self.split_sentences(paragraph_text)
-                paragraph_id = f"{os.path.basename(file_path)}_p{page_no}_{block_idx}"
+    #  COMMON 
+    def split_sentences(self, text):
+        sent_tokenize = get_sentence_splitter()
+        return [s.strip() for s in sent_tokenize(text) if s.strip()]
 
-                for sent_idx, sentence in enumerate(sentences):
-                    records.append({
-                        "embedding_text": sentence,
-                        "paragraph_text": paragraph_text,
-                        "source_type": "document",
-                        "source_name": os.path.basename(file_path),
-                        "page": page_no,
-                        "paragraph_id": paragraph_id,
-                        "sentence_index": sent_idx
-                    })
+    #  AUDIO / VIDEO 
+    def extract_from_audio(self, file_path, window=1):
+        raise ValueError(f"Audio/video needs WhisperTranscriber: {file_path}")
 
-        return records
+    #  PDF 
+    def extract_from_pdf(self, file_path, pages=None):
+        """pages: optional (first, end) 0-based page range, end exclusive."""
+        import fitz
+
+        # One page in memory at a time
+        with fitz.open(file_path) as doc:
+            first, end = pages or (0, doc.page_count)
+            for page_no in range(first + 1, end + 1):
+                blocks = doc[page_no - 1].get_text("blocks")
+
+                for block_idx, block in enumerate(blocks):
+                    paragraph_text = block[4].strip()
+                    if not paragraph_text:
+                        continue
+
+                    sentences = self.split_sentences(paragraph_text)
+                    paragraph_id = f"{paragraph_prefix(file_path)}_p{page_no}_{block_idx}"
+
+                    for sent_idx, sentence in enumerate(sentences):
+                        yield {
+                            "embedding_text": sentence,
+                            "paragraph_text": paragraph_text,
+                            "source_type": "document",
+                            "source_name": os.path.basename(file_path),
+                            "page": page_no,
+                            "paragraph_id": paragraph_id,
+                            "sentence_index": sent_idx
+                        }
 
     #  DOCX 
     def extract_from_docx(self, file_path):
+        from docx import Document
+
         doc = Document(file_path)
-        records = []
 
         for para_idx, para in enumerate(doc.paragraphs):
             paragraph_text = para.text.strip()
@@ -85,52 +249,59 @@ class WhisperTranscriber:
                 continue
 
             sentences = self.split_sentences(paragraph_text)
-            paragraph_id = f"{os.path.basename(file_path)}_para{para_idx}"
+            paragraph_id = f"{paragraph_prefix(file_path)}_para{para_idx}"
 
             for sent_idx, sentence in enumerate(sentences):
-                records.append({
+                yield {
                     "embedding_text": sentence,
                     "paragraph_text": paragraph_text,
                     "source_type": "document",
                     "source_name": os.path.basename(file_path),
                     "paragraph_id": paragraph_id,
                     "sentence_index": sent_idx
-                })
-
-        return records
+                }
 
     #  TXT 
+    def _iter_paragraphs(self, f):
+        """Blank-line separated paragraphs, read line by line."""
+        lines = []
+        for line in f:
+            if line == "\n":
+                if lines:
+                    yield "".join(lines)
+                lines = []
+            else:
+                lines.append(line)
+        if lines:
+            yield "".join(lines)
+
     def extract_from_txt(self, file_path):
         with open(file_path, "r", encoding="utf-8") as f:
-            paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+            paragraphs = (p.strip() for p in self._iter_paragraphs(f))
 
-        records = []
-
-        for para_idx, paragraph_text in enumerate(paragraphs):
-            sentences = self.split_sentences(paragraph_text)
-            paragraph_id = f"{os.path.basename(file_path)}_para{para_idx}"
-
-            for sent_idx, sentence in enumerate(sentences):
-                records.append({
-                    "embedding_text": sentence,
-                    "paragraph_text": paragraph_text,
-                    "source_type": "text",
-                    "source_name": os.path.basename(file_path),
-                    "paragraph_id": paragraph_id,
-                    "sentence_index": sent_idx
-                })
+            for para_idx, paragraph_text in enumerate(p for p in paragraphs if p):
+                sentences = self.split_sentences(paragraph_text)
+                paragraph_id = f"{paragraph_prefix(file_path)}_para{para_idx}"
 
-        return records
+                for sent_idx, sentence in enumerate(sentences):
+                    yield {
+                        "embedding_text": sentence,
+                        "paragraph_text": paragraph_text,
+                        "source_type": "text",
+                        "source_name": os.path.basename(file_path),
+                        "paragraph_id": paragraph_id,
+                        "sentence_index": sent_idx
+                    }
 
     #  ROUTER 
-    def extract_text(self, file_path):
+    def extract_text(self, file_path, pages=None):
         ext = file_path.lower()
 
-        if ext.endswith((".mp4", ".mkv", ".avi", ".mp3", ".wav")):
+        if ext.endswith(AUDIO_EXTENSIONS):
             return self.extract_from_audio(file_path)
 
         if ext.endswith(".pdf"):
-            return self.extract_from_pdf(file_path)
+            return self.extract_from_pdf(file_path, pages)
 
         if ext.endswith(".docx"):
             return self.extract_from_docx(file_path)
@@ -141,27 +312,341 @@ class WhisperTranscriber:
         raise ValueError(f"Unsupported file type: {file_path}")
 
     #  INGEST 
-    def ingest(self, input_path):
-        all_chunks = []
+    def extract_file(self, file_path, pages=None):
+        # Lets the vector store replace a file's vectors when it changes
+        source_path = os.path.abspath(file_path)
 
+        for r in self.extract_text(file_path, pages):
+            r["source_path"] = source_path
+            yield r
+
+    def iter_files(self, input_path):
         if os.path.isfile(input_path):
-            print(f"🔹 Processing file: {input_path}")
-            all_chunks.extend(self.extract_text(input_path))
+            yield input_path
 
         elif os.path.isdir(input_path):
             print(f"📂 Processing folder: {input_path}")
             for root, _, files in os.walk(input_path):
                 for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        print(f"  ↳ {file}")
-                        all_chunks.extend(self.extract_text(file_path))
-                    except Exception as e:
-                        print(f"❌ Skipped {file}: {e}")
+                    yield os.path.join(root, file)
 
         else:
             raise ValueError("Invalid file or directory path")
 
-        return all_chunks
+    def _skip(self, file_path, skip_file):
+        try:
+            skipped = bool(skip_file and skip_file(file_path))
+        except OSError:
+            skipped = False  # let extraction report the problem
+        if skipped:
+            print(f"  ⏭️ {os.path.basename(file_path)} (unchanged)")
+        return skipped
+
+    def _parse_parallel(self, files, workers):
+        """
+        Yield (file_path, records) in input order while text documents are
+        parsed ahead in a process pool: PDFs as ranges of
+        PDF_PAGES_PER_TASK pages, other documents whole. At most workers
+        tasks are queued or running, so only that many results wait in
+        memory however large the files. Audio files are transcribed here,
+        in this process, when their turn comes.
+        """
+        tasks = (
+            (n, file_path, pages)
+            for n, file_path in enumerate(files)
+            for pages in _page_ranges(file_path)
+        )
+        window = deque()  # (file number, file_path, future or None for audio)
+        abandoned = set()
+
+        # Spawned, not forked: this runs on the ingest prefetch thread while
+        # the embedding threads hold locks a forked child would inherit
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            def fill():
+                while len(window) < workers:
+                    task = next(tasks, None)
+                    if task is None:
+                        return
+                    n, file_path, pages = task
+                    if n in abandoned:
+                        continue
+                    if file_path.lower().endswith(AUDIO_EXTENSIONS):
+                        window.append((n, file_path, None))
+                    else:
+                        window.append((n, file_path, pool.submit(_extract_document, file_path, pages)))
+
+            def file_records(n):
+                # Takes this file's tasks off the window as they are consumed
+                while window and window[0][0] == n:
+                    _, file_path, future = window.popleft()
+                    fill()
+                    if future is None:
+                        yield from self.extract_file(file_path)
+                    else:
+                        yield from future.result()
+
+            fill()
+            while window:
+                n, file_path, _ = window[0]
+                yield file_path, file_records(n)
+
+                # Page ranges left over when the file failed part-way
+                abandoned.add(n)
+                while window and window[0][0] == n:
+                    _, _, future = window.popleft()
+                    if future is not None:
+                        future.cancel()
+                fill()
+
+    def _parse(self, files, workers):
+        if workers and workers > 1:
+            return self._parse_parallel(files, workers)
+        return ((p, self.extract_file(p)) for p in files)
+
+    def ingest(self, input_path, skip_file=None, workers=None):
+        """
+        Yield records file by file, as they are parsed, so embedding can
+        start before the whole folder has been read.
+
+        skip_file: optional predicate; files it returns True for (e.g.
+        BGEVectorStore.is_unchanged) are not parsed again.
+
+        workers: with more than one, PDF/DOCX/TXT files are parsed in a
+        pool of that many processes. Output order is the same as serial.
+
+        Files that fail part-way are added to self.failed_files; their
+        already-yielded records should not be treated as complete.
+        """
+        del self.failed_files[:]
+
+        files = (p for p in self.iter_files(input_path) if not self._skip(p, skip_file))
+
+        for file_path, records in self._parse(files, workers):
+            file = os.path.basename(file_path)
+            try:
+                print(f"  ↳ {file}")
+                yield from records
+            except Exception as e:
+                self.failed_files.append(os.path.abspath(file_path))
+                print(f"❌ Skipped {file}: {e}")
+
+
+def _page_ranges(file_path):
+    """
+    Page ranges a PDF is parsed in, [None] (the whole file) for anything
+    else or a PDF that cannot be opened here; the worker then reports
+    the error.
+    """
+    if not file_path.lower().endswith(".pdf"):
+        return [None]
+    try:
+        import fitz
+        with fitz.open(file_path) as doc:
+            n_pages = doc.page_count
+    except Exception:
+        return [None]
+    return [
+        (first, min(first + PDF_PAGES_PER_TASK, n_pages))
+        for first in range(0, n_pages, PDF_PAGES_PER_TASK)
+    ] or [None]
+
+
+# One extractor per pool process, created on first use
+_worker_extractor = None
+
+
+def _extract_document(file_path, pages=None):
+    """Process-pool task: parse one text document, or a page range of a PDF. Never loads Whisper."""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = DocumentExtractor()
+    return list(_worker_extractor.extract_file(file_path, pages))
+
+
+class WhisperTranscriber(DocumentExtractor):
+    """
+    batch_size > 1 switches audio to batched mode: files are cut into
+    ~30 s windows (see split_audio) and batch_size windows, from however
+    many files they span, are decoded per model call. Audio files are then
+    transcribed after the documents of the same ingest() run.
+    compute_type="int8" quantizes the model for CPU nodes.
+    """
+
+    # Use medium for speed + accuracy balance
+    def __init__(self, device="auto", model_size="medium", compute_type="default",
+                 batch_size=1, language=None):
+        super().__init__()
+        self.device = device
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+        self.language = language  # None = detected per window
+        self._whisper_model = None
+
+    @property
+    def whisper_model(self):
+        """Loaded on the first audio/video file, not when the transcriber is created."""
+        if self._whisper_model is None:
+            self._whisper_model = get_whisper_model(self.model_size, self.device, self.compute_type)
+        return self._whisper_model
+
+    def _fp16(self, model):
+        # fp16 decoding only makes sense on a GPU
+        return model.device.type == "cuda" and self.compute_type != "fp32"
+
+    def _segment_records(self, file_path, segments, window=1):
+        source_name = os.path.basename(file_path)
+        prefix = paragraph_prefix(file_path)
+
+        for idx, seg in enumerate(segments):
+            start_idx = max(0, idx - window)
+            end_idx = min(len(segments), idx + window + 1)
 
+            # The surrounding text is referenced by segment id and joined
+            # only when a prompt is built, instead of copying it per segment
+            yield {
+                "embedding_text": seg["text"].strip(),
+                "paragraph_id": f"{prefix}_seg{idx}",
+                "context_ids": [f"{prefix}_seg{i}" for i in range(start_idx, end_idx)],
+                "start_time": round(segments[start_idx]["start"], 2),
+                "end_time": round(segments[end_idx - 1]["end"], 2),
+                "source_type": "audio",
+                "source_name": source_name,
+                "segment_index": idx
+            }
 
+    #  AUDIO / VIDEO 
+    def extract_from_audio(self, file_path, window=1):
+        model = self.whisper_model
+        result = model.transcribe(file_path, fp16=self._fp16(model))
+        return self._segment_records(file_path, result["segments"], window)
+
+    #  BATCHED AUDIO 
+    def _parse(self, files, workers):
+        if self.batch_size <= 1:
+            return super()._parse(files, workers)
+
+        # Audio paths are set aside while the documents stream through;
+        # transcribe_batched() only starts reading the list once they are done
+        audio_files = []
+
+        def documents():
+            for file_path in files:
+                if file_path.lower().endswith(AUDIO_EXTENSIONS):
+                    audio_files.append(file_path)
+                else:
+                    yield file_path
+
+        return chain(super()._parse(documents(), workers), self.transcribe_batched(audio_files))
+
+    def _decode_windows(self, model, windows):
+        """Decode a batch of sample arrays; [(start, end, text), ...] per window, window-relative."""
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(w), model.dims.n_mels) for w in windows
+        ]).to(model.device)
+
+        options = whisper.DecodingOptions(task="transcribe", language=self.language, fp16=self._fp16(model))
+        with torch.no_grad():
+            results = whisper.decode(model, mel, options)
+
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, task="transcribe")
+        time_precision = WINDOW_SECONDS / model.dims.n_audio_ctx  # 0.02 s per timestamp token
+
+        decoded = []
+        for samples, result in zip(windows, results):
+            segments = []
+            # Same no-speech rule as whisper.transcribe()
+            if not (result.no_speech_prob > 0.6 and result.avg_logprob < -1.0):
+                start, last, text = None, 0.0, []
+                for token in result.tokens:
+                    if token < tokenizer.timestamp_begin:
+                        text.append(token)
+                        continue
+                    t = (token - tokenizer.timestamp_begin) * time_precision
+                    if text:
+                        segments.append((last if start is None else start, t, tokenizer.decode(text)))
+                        text, start = [], None
+                    else:
+                        start = t
+                    last = t
+                if text:  # no closing timestamp: runs to the end of the window
+                    end = len(samples) / SAMPLE_RATE
+                    segments.append((last if start is None else start, end, tokenizer.decode(text)))
+            decoded.append(segments)
+        return decoded
+
+    def transcribe_batched(self, file_paths, window=1, load_workers=2):
+        """
+        Yield (file_path, records) for audio files in input order, each as
+        soon as its last window has been decoded. Audio is piped from ffmpeg
+        as PCM in load_workers threads ahead of the model, with no
+        intermediate files. segment_index, start/end times and context_ids
+        are per file, as in extract_from_audio().
+        """
+        pending = deque()  # per-file state, input order
+        queued = []        # (state, offset, samples) waiting for a batch
+        started = time.perf_counter()
+        audio_seconds = 0.0
+        n_files = 0
+
+        def decode(batch):
+            # Loaded with the first batch, so a run without audio never loads Whisper
+            model = self.whisper_model
+            try:
+                results = self._decode_windows(model, [samples for _, _, samples in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (state, offset, _), segments in zip(batch, results):
+                state["remaining"] -= 1
+                if isinstance(segments, Exception):
+                    state["error"] = state["error"] or segments
+                    continue
+                state["segments"].extend(
+                    {"start": offset + start, "end": offset + end, "text": text}
+                    for start, end, text in segments if text.strip()
+                )
+
+        def finished():
+            while pending and pending[0]["remaining"] == 0:
+                state = pending.popleft()
+                if state["error"] is not None:
+                    yield state["path"], _failed_records(state["error"])
+                    continue
+                source_path = os.path.abspath(state["path"])
+                records = list(self._segment_records(state["path"], state["segments"], window))
+                for r in records:
+                    r["source_path"] = source_path
+                yield state["path"], records
+
+        for file_path, audio in iter_decoded_audio(file_paths, workers=load_workers):
+            state = {"path": file_path, "remaining": 0, "segments": [], "error": None}
+            pending.append(state)
+            n_files += 1
+
+            if isinstance(audio, Exception):
+                state["error"] = audio
+            else:
+                audio_seconds += len(audio) / SAMPLE_RATE
+                for offset, samples in split_audio(audio):
+                    state["remaining"] += 1
+                    queued.append((state, offset, samples))
+
+            while len(queued) >= self.batch_size:
+                batch, queued = queued[:self.batch_size], queued[self.batch_size:]
+                decode(batch)
+            yield from finished()
+
+        if queued:
+            decode(queued)
+        yield from finished()
+
+        elapsed = time.perf_counter() - started
+        if n_files:
+            print(f"🎙️ Transcribed {n_files} files, {audio_seconds / 60:.1f} min of audio in "
+                  f"{elapsed:.1f}s ({audio_seconds / max(elapsed, 1e-9):.1f}x realtime)")
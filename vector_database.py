@@ -1,41 +1,361 @@
 import os
 import json
-import requests
-import faiss
+from ollama_client import OllamaClient, get_client
+from lazy_import import LazyModule
 import numpy as np
+import requests
 from tqdm import tqdm
-from text_chunker import WhisperTranscriber
+from embedding_cache import EmbeddingCache, get_default_cache
+from metadata_store import (
+    TEXT_COLUMNS, ColumnarMetadata, ParagraphTable, write_columnar, write_paragraphs
+)
+from index_factory import (
+    all_vectors, make_index, needs_training, read_index, removes_in_place, resolve_index_params,
+    search_params, stored_index_type, stored_vectors, QUANTIZED_TYPES
+)
+from full_precision import FullPrecisionVectors, rescore
+from lexical_index import LexicalIndex
+from facet_index import FacetIndex
 import re
+import math
 import unicodedata
+import threading
+import time
+import hashlib
+import shutil
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+faiss = LazyModule("faiss")  # imported on first use, not at startup
+
+# Process-wide registry of loaded stores, keyed by absolute index path.
+# Shared by all Flask worker threads so the index is read from disk once.
+_STORE_REGISTRY = {}
+_STORE_LOCK = threading.Lock()
+
+# Reciprocal rank fusion: score = sum of 1 / (RRF_K + rank) over the dense
+# and lexical rankings, each cut at max(top_k * 4, RRF_CANDIDATES)
+RRF_K = 60
+RRF_CANDIDATES = 20
+
+# A filter matching at most this many rows is scored exactly from the
+# stored vectors instead of through the ANN index (IVF/HNSW)
+EXACT_FILTER_MAX = 4096
+
+# Chunks with fewer words carry too little meaning to answer from; they
+# are not embedded (see embeddable_text)
+MIN_WORDS = 6
+
+
+def _current_generation_dir(index_path):
+    """
+    Directory of the snapshot named by CURRENT, or None for a store still
+    in the old index.faiss + metadata.json layout.
+    """
+    current_file = os.path.join(index_path, "CURRENT")
+    if not os.path.exists(current_file):
+        return None
+    with open(current_file, "r", encoding="utf-8") as f:
+        return os.path.join(index_path, f.read().strip())
+
+
+def store_exists(index_path):
+    return (
+        os.path.exists(os.path.join(index_path, "CURRENT"))
+        or os.path.exists(os.path.join(index_path, "index.faiss"))
+    )
+
+
+def _index_signature(index_path):
+    """
+    Changes whenever save() publishes a new snapshot: the generation named
+    by CURRENT, or (mtime_ns, size) of the old-layout files.
+    """
+    generation_dir = _current_generation_dir(index_path)
+    if generation_dir is not None:
+        return (os.path.basename(generation_dir),)
+
+    signature = []
+    for name in ("index.faiss", "metadata.json"):
+        st = os.stat(os.path.join(index_path, name))
+        signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def get_vector_store(index_path="src/vector_db", model_name="bge-m3", dim=1024):
+    """
+    Return the resident store for index_path, loading it on first use and
+    reloading it when the files on disk change.
+    """
+    key = os.path.abspath(index_path)
+    signature = _index_signature(index_path)
+
+    store = _STORE_REGISTRY.get(key)
+    if store is not None and store.signature == signature:
+        return store
+
+    with _STORE_LOCK:
+        # Another thread may have reloaded while we waited for the lock
+        store = _STORE_REGISTRY.get(key)
+        if store is not None and store.signature == _index_signature(index_path):
+            return store
+
+        previous_generation = store.generation if store is not None else 0
+
+        start = time.perf_counter()
+        fresh = BGEVectorStore(model_name=model_name, dim=dim, index_path=index_path)
+        fresh.load(mmap=True)
+        fresh.load_seconds = time.perf_counter() - start
+        fresh.generation = previous_generation + 1
+
+        # Swap in a fully loaded store; readers holding the old one keep using it
+        _STORE_REGISTRY[key] = fresh
+
+        print(
+            f"📦 Vector store loaded in {fresh.load_seconds:.2f}s "
+            f"({fresh.index.ntotal} vectors, generation {fresh.generation}, "
+            f"lexical index {fresh.lexical.stats()['memory_mb']} MB)"
+        )
+        return fresh
+
+
+def resident_stats():
+    """Size of every loaded resident store, without loading any."""
+    return {
+        path: {
+            "vectors": store.index.ntotal,
+            "generation": store.generation,
+            "lexical": store.lexical.stats(),
+        }
+        for path, store in list(_STORE_REGISTRY.items())
+    }
+
+
+def _prefetch(iterable, maxsize):
+    """
+    Consume iterable on a background thread and hand items over through a
+    bounded queue, so parsing runs ahead of embedding by at most maxsize
+    records.
+    """
+    items = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            items.put((done, None))
+        except Exception as e:
+            items.put((done, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def file_fingerprint(file_path):
+    """Size and content hash used to decide whether a file needs re-ingesting."""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return {"size": os.path.getsize(file_path), "sha256": sha.hexdigest()}
+
+
+def open_vector_store_for_ingest(index_path="src/vector_db", model_name="bge-m3", dim=1024,
+                                 index_type="flat", index_params=None):
+    """
+    Store for incremental ingestion: loads the existing index if there is
+    one and keeps chunk embeddings in a content-addressed cache on disk,
+    so re-ingesting unchanged text never goes back to Ollama.
+
+    index_type/index_params only apply to a new store; an existing one
+    keeps the type recorded in its index_meta.json.
+    """
+    os.makedirs(index_path, exist_ok=True)
+    cache = EmbeddingCache(disk_path=os.path.join(index_path, "embeddings.sqlite"))
+
+    store = BGEVectorStore(
+        model_name=model_name,
+        dim=dim,
+        index_path=index_path,
+        embedding_cache=cache,
+        index_type=index_type,
+        index_params=index_params
+    )
+    if store_exists(index_path):
+        store.load()
+        store.prune_unusable()
+    return store
+
+
+def migrate_legacy_store(index_path="src/vector_db"):
+    """
+    One-shot conversion of an index.faiss + metadata.json store to the
+    generation layout (mmap-able index, columnar metadata), dropping the
+    short or junk chunks ingestion now filters out. The old files are
+    left in place and ignored from then on. A store already in the new
+    format that was saved before that filter is only pruned.
+    """
+    store = BGEVectorStore(index_path=index_path)
+    store.load()
+
+    if _current_generation_dir(index_path) is not None:
+        if not store.pruned:
+            store.prune_unusable()
+            store.save()
+        print(f"✅ {index_path} is already in the new format")
+        return
+
+    store.prune_unusable()
+    store.save()
+
+    legacy_size = os.path.getsize(os.path.join(index_path, "metadata.json"))
+    metadata_dir = os.path.join(_current_generation_dir(index_path), "metadata")
+    new_size = sum(
+        os.path.getsize(os.path.join(metadata_dir, name)) for name in os.listdir(metadata_dir)
+    )
+    print(
+        f"✅ Migrated {store.index.ntotal} vectors; metadata "
+        f"{legacy_size / 1e6:.1f} MB -> {new_size / 1e6:.1f} MB. "
+        "index.faiss and metadata.json in the store root can be deleted."
+    )
+
+
+class AdaptiveBatchSizer:
+    """
+    Picks the next embedding batch size from what recent batches cost.
+
+    Grows additively while batches finish under target_latency, halves on
+    errors or slow batches, and never lets one request carry more than
+    max_chars characters of text.
+    """
+
+    def __init__(self, initial=32, min_size=1, max_size=256,
+                 target_latency=2.0, max_chars=60000):
+        self.size = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+
+    def observe(self, n_texts, seconds, failed=False):
+        with self._lock:
+            if failed or seconds > self.target_latency * 1.5:
+                self.size = max(self.min_size, self.size // 2)
+            elif seconds < self.target_latency / 2 and n_texts >= self.size:
+                self.size = min(self.max_size, self.size + max(1, self.size // 4))
+
 
 class BGEVectorStore:
     def __init__(
         self,
         model_name="bge-m3",
-        ollama_url="http://localhost:11434/api/embed",
+        ollama_url=None,
         dim=1024,
-        index_path="src/vector_store"
+        index_path="src/vector_store",
+        embedding_cache=None,
+        index_type="flat",
+        index_params=None,
+        client=None
     ):
         self.model_name = model_name
-        self.ollama_url = ollama_url
+
+        # Shared pooled client (OLLAMA_HOST); an explicit .../api/embed URL
+        # gets a client of its own for that server
+        if client is None:
+            client = OllamaClient(ollama_url.rsplit("/api/", 1)[0]) if ollama_url else get_client()
+        self.client = client
+        self.ollama_url = client.url("embed")
         self.dim = dim
         self.index_path = index_path
 
-        self.index = faiss.IndexFlatIP(dim)  # cosine similarity
+        # Query and chunk embeddings are memoized across calls
+        self.embedding_cache = embedding_cache or get_default_cache()
+
+        # Tokens Ollama reports having embedded, for throughput stats
+        self._embedded_tokens = 0
+        self._stats_lock = threading.Lock()
+        self.last_ingest_stats = None
+
+        # See index_factory.INDEX_TYPES. IVF types start as an exact flat
+        # index and are trained once enough vectors have been added.
+        self.index_type = index_type
+        self.index_params = resolve_index_params(index_type, index_params)
+        self._index = None  # built on first use, see index
         self.metadata = []
 
-    def _embed_once(self, texts):
+        # float32 copies for re-scoring a quantized index ("rescore" in
+        # index_params); None when the index is searched on its own
+        self.full_vectors = FullPrecisionVectors(dim) if self.index_params.get("rescore") else None
 
-        response = requests.post(
-            self.ollama_url,
-            json={"model": self.model_name, "input": texts},
-            timeout=300
-        )
+        # source_path -> {"size", "sha256"} of every ingested file
+        self.file_manifest = {}
+
+        # paragraph_id -> paragraph (or audio segment) text, shared by every
+        # sentence record of that paragraph; see resolve_texts()
+        self.paragraphs = {}
+
+        # BM25 over embedding_text, row i == index row i; fused with the
+        # dense results in search()
+        self.lexical = LexicalIndex()
+
+        # Row ids per source_type/source_name value and page per row, for
+        # filtered search; rebuilt from metadata when rows change
+        self._facets = None
+
+        # Rows queued by remove_source()/prune_unusable(); they are dropped
+        # together by _flush_removals(), so re-ingesting k files rebuilds
+        # IVF lists or the HNSW graph once instead of k times
+        self._pending_removal = set()
+
+        # False for stores saved before ingestion filtered junk chunks: until
+        # prune_unusable() has run, search skips the rows in _unusable
+        self.pruned = True
+        self._unusable = None
+
+        # Filled in by load(); used by get_vector_store() to detect changes
+        self.signature = None
+        self.read_only = False
+        self.generation = 0
+        self.load_seconds = 0.0
+
+    @property
+    def index(self):
+        # Created lazily so a store that only delegates to the resident one
+        # (e.g. the UI's module-level db) never imports faiss at startup
+        if self._index is None:
+            if needs_training(self.index_type):
+                self._index = faiss.IndexFlatIP(self.dim)  # cosine similarity
+            else:
+                self._index = make_index(self.index_type, self.dim, self.index_params)
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        self._index = index
 
-        if response.status_code != 200:
-            raise RuntimeError(response.text)
+    def _embed_once(self, texts):
 
-        data = response.json()
+        data = self.client.embed(self.model_name, texts)
 
         if "embeddings" in data:
             emb = data["embeddings"]
@@ -49,6 +369,15 @@ class BGEVectorStore:
         if np.isnan(arr).any():
             raise ValueError("NaN detected")
 
+        # Every embedding leaves here unit-length, so IndexFlatIP scores are
+        # true cosine similarities whichever path produced them
+        faiss.normalize_L2(arr)
+
+        # Older servers don't report a count; fall back to a word estimate
+        tokens = data.get("prompt_eval_count") or sum(len(t.split()) for t in texts)
+        with self._stats_lock:
+            self._embedded_tokens += tokens
+
         return arr
 
     import re
@@ -97,27 +426,115 @@ class BGEVectorStore:
 
         return text
 
+    def embeddable_text(self, text):
+        """Text to embed for a chunk, or "" for junk (numbers, separators, short fragments)."""
+        text = self.clean_for_embedding(self.normalize_for_embedding(text))
+        if len(text.split()) < MIN_WORDS:
+            return ""
+        return text
+
+    def prune_unusable(self):
+        """
+        Queue the removal of rows ingested before embeddable_text() filtered
+        them out; returns how many.
+        """
+        ids = [
+            i for i, r in enumerate(self.metadata)
+            if i not in self._pending_removal and not self.embeddable_text(r["embedding_text"])
+        ]
+        if ids:
+            self._pending_removal.update(ids)
+            print(f"🧹 Removing {len(ids)} short or junk chunks from the index")
+        self.pruned = True
+        self._unusable = None
+        return len(ids)
+
+    def _mask_unusable(self, texts):
+        """For stores that were never pruned: hide the rows prune_unusable() would drop."""
+        self._unusable = None
+        if self.pruned:
+            return
+        unusable = np.array([not self.embeddable_text(t or "") for t in texts], dtype=bool)
+        if unusable.any():
+            self._unusable = unusable
+            print(f"⚠️ {int(unusable.sum())} short or junk chunks hidden from search; "
+                  "migrate_legacy_store() or the next ingest removes them")
+
     # EMBEDDING
+    @staticmethod
+    def _is_input_error(e):
+        """
+        True for failures caused by the texts themselves (rejected with a
+        4xx/500 or embedded as NaN), which splitting the batch can isolate.
+        Connection errors, timeouts and overload statuses are not.
+        """
+        if isinstance(e, requests.HTTPError) and e.response is not None:
+            status = e.response.status_code
+            return status == 500 or (400 <= status < 500 and status != 429)
+        return isinstance(e, ValueError)
+
     def embed_batch(self, texts):
+        """
+        Returns (embeddings, kept) where kept lists the positions in texts
+        that were embedded; texts Ollama rejects are skipped.
+
+        A batch rejected because of its input is split in halves until the
+        bad texts are isolated, so one bad text costs about 2*log2(n) extra
+        requests instead of n. Any other failure (Ollama down, timeouts)
+        is raised, as is a batch where every text failed.
+        """
+        embeddings, kept = self._embed_bisect(texts)
+        if texts and not kept:
+            raise RuntimeError("All texts failed embedding")
+        return embeddings, kept
+
+    def _embed_bisect(self, texts):
         try:
-            return self._embed_once(texts)
+            return self._embed_once(texts), list(range(len(texts)))
         except Exception as e:
-            print("⚠️ Batch failed, retrying individually:", e)
-
-            embeddings = []
-            for t in texts:
-                try:
-                    emb = self._embed_once([t])
-                    embeddings.append(emb[0])
-                except Exception:
-                    print("❌ Skipping text (still NaN):", t[:80])
-
-            if not embeddings:
-                raise RuntimeError("All texts failed embedding")
-
-            embeddings = np.array(embeddings, dtype="float32")
-            faiss.normalize_L2(embeddings)
-            return embeddings
+            if not self._is_input_error(e):
+                raise
+
+            if len(texts) == 1:
+                print("❌ Skipping text:", texts[0][:80], "-", e)
+                return np.empty((0, self.dim), dtype="float32"), []
+
+            mid = len(texts) // 2
+            left, left_kept = self._embed_bisect(texts[:mid])
+            right, right_kept = self._embed_bisect(texts[mid:])
+
+            return (
+                np.vstack([left, right]),
+                left_kept + [mid + i for i in right_kept]
+            )
+
+    def embed_texts(self, texts):
+        """
+        Embed normalized texts, serving repeats from the embedding cache.
+        Same return shape as embed_batch().
+        """
+        vectors = self.embedding_cache.get_many(self.model_name, texts)
+
+        # Each distinct uncached text is sent to Ollama once
+        missing = list(dict.fromkeys(
+            t for t, v in zip(texts, vectors) if v is None
+        ))
+
+        if missing:
+            embeddings, kept = self.embed_batch(missing)
+            fresh = [missing[i] for i in kept]
+            self.embedding_cache.put_many(self.model_name, fresh, embeddings)
+
+            fresh_vectors = dict(zip(fresh, embeddings))
+            vectors = [
+                v if v is not None else fresh_vectors.get(t)
+                for t, v in zip(texts, vectors)
+            ]
+
+        kept = [i for i, v in enumerate(vectors) if v is not None]
+        embeddings = np.array([vectors[i] for i in kept], dtype="float32")
+        return embeddings.reshape(len(kept), self.dim), kept
+
     # def embed_batch(self, texts):
     #     response = requests.post(
     #         self.ollama_url,
@@ -137,88 +554,788 @@ class BGEVectorStore:
     #     faiss.normalize_L2(embeddings)
     #     return embeddings
 
-    # INGEST
-    def add_documents(self, records, batch_size=32):
+    # INCREMENTAL INGEST
+    def is_unchanged(self, file_path):
+        """True if file_path was already ingested with the same size and hash."""
+        entry = self.file_manifest.get(os.path.abspath(file_path))
+        if entry is None or entry["size"] != os.path.getsize(file_path):
+            return False
+        return entry == file_fingerprint(file_path)
+
+    def remove_source(self, file_path):
         """
-        records: list of dicts with 'embedding_text'
+        Drop every vector and metadata row that came from file_path. The
+        rows are queued and removed by the next add_documents(), search or
+        save(); returns how many.
         """
-        for i in tqdm(range(0, len(records), batch_size), desc="Embedding"):
-            batch = records[i:i + batch_size]
-            # texts = [r["embedding_text"] for r in batch]
+        source_path = os.path.abspath(file_path)
+        source_name = os.path.basename(file_path)
 
-            texts = []
-            valid_records = []
+        def from_source(r):
+            # Records from before source_path existed only carry the file name
+            if "source_path" in r:
+                return r["source_path"] == source_path
+            return r.get("source_name") == source_name
 
-            for r in batch:
-                t = self.normalize_for_embedding(r["embedding_text"])
+        ids = [i for i, r in enumerate(self.metadata) if i not in self._pending_removal and from_source(r)]
+        self._pending_removal.update(ids)
 
-                if len(t) < 30:
-                    continue
+        self.file_manifest.pop(source_path, None)
+        return len(ids)
+
+    def _flush_removals(self):
+        """Remove every queued row in one pass over the index, BM25 and metadata."""
+        if not self._pending_removal:
+            return
+        ids = sorted(self._pending_removal)
+        self._remove_ids(ids)
+        self.metadata = [r for i, r in enumerate(self.metadata) if i not in self._pending_removal]
+        self._pending_removal = set()
+
+    # INDEX BUILD
+    def _build_index(self, vectors, index_type):
+        """Fresh index of index_type holding vectors, trained on the first train_size."""
+        if needs_training(index_type):
+            train = vectors[:self.index_params["train_size"]]
+            index = make_index(index_type, self.dim, self.index_params, n_train=len(train))
+            index.train(train)
+        else:
+            index = make_index(index_type, self.dim, self.index_params)
+
+        index.add(vectors)
+        return index
+
+    def _maybe_train(self, final=False):
+        """
+        Swap the interim flat index for the configured IVF index once there
+        are train_size vectors, or min_train when finishing (save()).
+        """
+        if not needs_training(self.index_type) or stored_index_type(self.index) != "flat":
+            return
+
+        threshold = self.index_params["min_train" if final else "train_size"]
+        if self.index.ntotal < threshold:
+            return
+
+        start = time.perf_counter()
+        self.index = self._build_index(all_vectors(self.index), self.index_type)
+        print(f"🧭 Trained {self.index_type} index on {self.index.ntotal} vectors "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def _remove_ids(self, ids):
+        """
+        Delete rows so the remaining ones shift down, keeping index row i in
+        step with metadata[i].
+        """
+        self.lexical.remove_ids(ids)
+        self._facets = None
+        if self.full_vectors is not None:
+            self.full_vectors.remove_ids(ids)
+
+        if removes_in_place(self.index):
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+            return
+
+        # IVF keeps the old ids after remove_ids and HNSW cannot remove at
+        # all, so re-add the kept vectors; reset() keeps IVF training
+        keep = np.ones(self.index.ntotal, dtype=bool)
+        keep[ids] = False
+        vectors = all_vectors(self.index)[keep]
+        self.index.reset()
+        self.index.add(vectors)
+
+    # PARAGRAPH TABLE
+    def _store_record(self, r):
+        """
+        Move a record's paragraph text into the shared table and return the
+        copy that gets stored, which only keeps the paragraph_id.
+        """
+        pid = r.get("paragraph_id")
+        if pid is None:
+            return r
+
+        if "paragraph_text" in r:
+            self.paragraphs[pid] = r["paragraph_text"]
+        elif "context_ids" in r:
+            # Audio: each segment is its own paragraph, context is its neighbours
+            self.paragraphs[pid] = r["embedding_text"].strip()
+
+        return {k: v for k, v in r.items() if k not in TEXT_COLUMNS}
+
+    def _paragraph_table(self):
+        if self.signature is None and not self.metadata:
+            # Unloaded store (like the UIs' module-level db): use the resident one
+            return self.resident().paragraphs
+        return self.paragraphs
+
+    def paragraph_text(self, paragraph_id):
+        """Text of one paragraph (or audio segment), None if unknown."""
+        return self._paragraph_table().get(paragraph_id)
+
+    def resolve_texts(self, records):
+        """
+        Fill in paragraph_text / context_text of search results from the
+        paragraph table. Meant to run right before a prompt is built, so
+        only the passages that reach the LLM are ever materialized.
+        """
+        table = self._paragraph_table()
+
+        for r in records:
+            if "context_ids" in r and "context_text" not in r:
+                r["context_text"] = " ".join(
+                    table.get(pid) for pid in r["context_ids"] if pid in table
+                )
+            elif "paragraph_id" in r and "paragraph_text" not in r:
+                text = table.get(r["paragraph_id"])
+                if text is not None:
+                    r["paragraph_text"] = text
+
+        return records
+
+    # INGEST
+    def _iter_batches(self, records, sizer, files):
+        """
+        Yield (texts, records, finished_sources) for embeddable records,
+        sized by the sizer at the moment each batch is cut.
+        finished_sources are files whose last record is in this batch or
+        an earlier one.
+        """
+        texts = []
+        valid_records = []
+        chars = 0
+        finished = []
+        current_source = None
 
-                texts.append(t)
-                valid_records.append(r)
+        for r in records:
+            source_path = r.get("source_path")
+            if source_path != current_source:
+                if current_source is not None:
+                    finished.append(current_source)
+                current_source = source_path
+                if source_path is not None and source_path not in files:
+                    self._start_source(source_path, files)
 
-            if not texts:
+            # Registered before filtering: a short segment can still be
+            # a neighbour's context
+            r = self._store_record(r)
+            t = self.embeddable_text(r["embedding_text"])
+
+            if not t:
                 continue
-            print("\n\n")
-            print(texts)
 
-            embeddings = self.embed_batch(texts)
+            texts.append(t)
+            valid_records.append(r)
+            chars += len(t)
+
+            if len(texts) >= sizer.size or chars >= sizer.max_chars:
+                yield texts, valid_records, finished
+                texts, valid_records, chars, finished = [], [], 0, []
+
+        if current_source is not None:
+            finished.append(current_source)
+        if texts or finished:
+            yield texts, valid_records, finished
+
+    def _start_source(self, source_path, files):
+        removed = self.remove_source(source_path)
+        if removed:
+            tqdm.write(f"♻️ Replacing {removed} vectors from {os.path.basename(source_path)}")
+        files[source_path] = {"indexed": 0, "failed": 0, "start": time.perf_counter()}
+
+    def _finish_source(self, source_path, state):
+        if state["failed"]:
+            # Not recorded as done, so the next run parses the file again
+            self.file_manifest.pop(source_path, None)
+            tqdm.write(
+                f"  ⚠️ {os.path.basename(source_path)}: {state['indexed']} chunks indexed, "
+                f"{state['failed']} failed to embed; it will be ingested again next run"
+            )
+            return
+
+        if os.path.isfile(source_path):
+            self.file_manifest[source_path] = file_fingerprint(source_path)
+        tqdm.write(
+            f"  ✅ {os.path.basename(source_path)}: {state['indexed']} chunks indexed "
+            f"in {time.perf_counter() - state['start']:.1f}s"
+        )
+
+    def _timed_embed(self, texts):
+        start = time.perf_counter()
+        embeddings, kept = self.embed_texts(texts)
+        return embeddings, kept, time.perf_counter() - start
 
+    def _insert_batch(self, future, valid_records, finished, sizer, files):
+        added = 0
+
+        if future is not None:
+            embeddings, kept, seconds = future.result()
+            sizer.observe(len(valid_records), seconds, failed=len(kept) < len(valid_records))
+
+            # Only records that were actually embedded get a metadata row,
+            # so index position i always matches metadata[i]
             self.index.add(embeddings)
-            self.metadata.extend(batch)
+            if self.full_vectors is not None:
+                self.full_vectors.add(embeddings)
+            self.metadata.extend(valid_records[i] for i in kept)
+            self.lexical.add(valid_records[i]["embedding_text"] for i in kept)
+            self._facets = None
+            self._maybe_train()
+            added = len(kept)
+
+            kept_set = set(kept)
+            for i, r in enumerate(valid_records):
+                state = files.get(r.get("source_path"))
+                if state is not None:
+                    state["indexed" if i in kept_set else "failed"] += 1
+
+        for source_path in finished:
+            self._finish_source(source_path, files[source_path])
+
+        return added
+
+    def add_documents(self, records, batch_size=32, max_in_flight=4, adaptive=True, prefetch=1024):
+        """
+        records: iterable of dicts with 'embedding_text', e.g. the generator
+        from WhisperTranscriber.ingest()
+
+        New vectors are appended to the loaded index. Files that were
+        ingested before have their old vectors replaced.
+
+        Parsing, embedding and insertion overlap: a generator is drained on
+        a background thread into a queue of at most prefetch records, up to
+        max_in_flight batches are embedded concurrently, and results are
+        added to the index in the original order. Each stage blocks when
+        the next one falls behind, so memory stays flat however large the
+        corpus is.
+
+        With adaptive=True, batch_size is only the starting size; see
+        AdaptiveBatchSizer.
+        """
+        if self.read_only:
+            raise RuntimeError("Store was loaded with mmap=True and is read-only")
+
+        if prefetch and not isinstance(records, (list, tuple)):
+            records = _prefetch(records, prefetch)
+
+        start = time.perf_counter()
+        tokens_before = self._embedded_tokens
+        indexed = 0
+
+        if adaptive:
+            sizer = AdaptiveBatchSizer(initial=batch_size)
+        else:
+            sizer = AdaptiveBatchSizer(initial=batch_size, min_size=batch_size, max_size=batch_size)
+
+        files = {}  # source_path -> per-file progress for this run
+        progress = tqdm(desc="Embedding", unit="text")
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            for texts, valid_records, finished in self._iter_batches(records, sizer, files):
+                future = pool.submit(self._timed_embed, texts) if texts else None
+                pending.append((future, valid_records, finished, sizer, files))
+
+                # Backpressure: wait for the oldest batch before queueing more
+                if len(pending) >= max_in_flight:
+                    added = self._insert_batch(*pending.popleft())
+                    indexed += added
+                    progress.update(added)
+
+            while pending:
+                added = self._insert_batch(*pending.popleft())
+                indexed += added
+                progress.update(added)
+
+        progress.close()
+        # Rows of replaced files were kept until now; new rows were appended after them
+        self._flush_removals()
+
+        elapsed = time.perf_counter() - start
+        tokens = self._embedded_tokens - tokens_before
+        self.last_ingest_stats = {
+            "files": len(files),
+            "texts": indexed,
+            "tokens": tokens,
+            "seconds": round(elapsed, 3),
+            "texts_per_s": round(indexed / elapsed, 1) if elapsed else 0.0,
+            "tokens_per_s": round(tokens / elapsed, 1) if elapsed else 0.0,
+            "final_batch_size": sizer.size,
+        }
+        print(
+            f"⚡ Embedded {indexed} texts in {elapsed:.2f}s "
+            f"({self.last_ingest_stats['texts_per_s']} texts/s, "
+            f"{self.last_ingest_stats['tokens_per_s']} tokens/s)"
+        )
 
     # SAVE
     def save(self):
+        """
+        Write a new snapshot directory (gen-NNNNNN) and publish it by
+        rewriting CURRENT, so readers never see a half-written store and
+        files a running process has memory-mapped are never overwritten.
+        """
         os.makedirs(self.index_path, exist_ok=True)
+        self._flush_removals()
+        self._maybe_train(final=True)
+
+        previous_dir = _current_generation_dir(self.index_path)
+        generations = [
+            int(name.split("-")[1]) for name in os.listdir(self.index_path)
+            if re.fullmatch(r"gen-\d+", name)
+        ]
+        generation_name = f"gen-{max(generations, default=0) + 1:06d}"
+        generation_dir = os.path.join(self.index_path, generation_name)
+        os.makedirs(generation_dir)
+
+        faiss.write_index(self.index, os.path.join(generation_dir, "index.faiss"))
+        write_columnar(self.metadata, os.path.join(generation_dir, "metadata"))
 
-        faiss.write_index(
-            self.index,
-            os.path.join(self.index_path, "index.faiss")
+        self.lexical.save(os.path.join(generation_dir, "lexical"))
+        self.facets().save(os.path.join(generation_dir, "facets"))
+
+        if self.full_vectors is not None:
+            self.full_vectors.save(os.path.join(generation_dir, "vectors.npy"))
+
+        stored_type = stored_index_type(self.index)
+        if stored_type in QUANTIZED_TYPES:
+            index_mb = self.index.code_size * self.index.ntotal / 1e6
+            float_mb = self.index.ntotal * self.dim * 4 / 1e6
+            print(f"🗜️ {stored_type} index: {index_mb:.1f} MB instead of {float_mb:.1f} MB as float32"
+                  + (" (float32 copy memory-mapped for re-scoring)" if self.full_vectors is not None else ""))
+        lexical = self.lexical.stats()
+        print(f"🔤 Lexical index: {lexical['terms']} terms, {lexical['postings']} postings, "
+              f"{lexical['memory_mb']} MB")
+
+        # Only paragraphs still referenced (removed files drop theirs)
+        referenced = set()
+        for r in self.metadata:
+            referenced.add(r.get("paragraph_id"))
+            referenced.update(r.get("context_ids", ()))
+        write_paragraphs(
+            {pid: text for pid, text in self.paragraphs.items() if pid in referenced},
+            os.path.join(generation_dir, "paragraphs")
         )
 
-        with open(os.path.join(self.index_path, "metadata.json"), "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(generation_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.file_manifest, f, indent=2)
+
+        # Which index type is on disk (an IVF store that is still too small
+        # to train is saved as flat) and what it was configured as
+        with open(os.path.join(generation_dir, "index_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "index_type": stored_index_type(self.index),
+                "configured_type": self.index_type,
+                "index_params": self.index_params,
+                "dim": self.dim,
+                "ntotal": self.index.ntotal,
+                "pruned": self.pruned
+            }, f, indent=2)
+
+        current_file = os.path.join(self.index_path, "CURRENT")
+        with open(current_file + ".tmp", "w", encoding="utf-8") as f:
+            f.write(generation_name)
+        os.replace(current_file + ".tmp", current_file)
+
+        # Keep the previous snapshot for readers still using it
+        keep = {generation_name, os.path.basename(previous_dir or "")}
+        for name in os.listdir(self.index_path):
+            if re.fullmatch(r"gen-\d+", name) and name not in keep:
+                shutil.rmtree(os.path.join(self.index_path, name), ignore_errors=True)
 
     # LOAD
-    def load(self):
-        self.index = faiss.read_index(
-            os.path.join(self.index_path, "index.faiss")
-        )
+    def load(self, mmap=False):
+        """
+        mmap=True memory-maps the index (index_factory.read_index) and
+        leaves metadata as a lazy ColumnarMetadata view: fast, shared
+        between processes by the page cache, but read-only. Ingestion
+        loads with mmap=False.
+        """
+        self.signature = _index_signature(self.index_path)
+        generation_dir = _current_generation_dir(self.index_path)
+
+        if generation_dir is None:
+            # Old layout: index.faiss + metadata.json in the store root
+            self.index = faiss.read_index(
+                os.path.join(self.index_path, "index.faiss")
+            )
+
+            with open(os.path.join(self.index_path, "metadata.json"), "r", encoding="utf-8") as f:
+                self.metadata = [self._store_record(r) for r in json.load(f)]
 
-        with open(os.path.join(self.index_path, "metadata.json"), "r", encoding="utf-8") as f:
-            self.metadata = json.load(f)
+            self.lexical = LexicalIndex.build(r["embedding_text"] for r in self.metadata)
+            self._load_settings(self.index_path)
+            self._mask_unusable(r["embedding_text"] for r in self.metadata)
+            self._load_full_vectors(os.path.join(self.index_path, "vectors.npy"))
+            return
+
+        self.index = read_index(os.path.join(generation_dir, "index.faiss"), mmap=mmap)
+
+        paragraphs_dir = os.path.join(generation_dir, "paragraphs")
+        if os.path.exists(paragraphs_dir):
+            table = ParagraphTable(paragraphs_dir)
+            self.paragraphs = table if mmap else dict(table.items())
+
+        metadata = ColumnarMetadata(os.path.join(generation_dir, "metadata"))
+        if mmap:
+            self.metadata = metadata
+        else:
+            # Rows written before the paragraph table existed carry their text inline
+            self.metadata = [self._store_record(r) for r in metadata]
+        self.read_only = mmap
+
+        self._load_lexical(os.path.join(generation_dir, "lexical"), metadata, mmap)
+
+        # Older generations get theirs built on the first filtered search
+        self._facets = None
+        facets_dir = os.path.join(generation_dir, "facets")
+        if os.path.exists(facets_dir):
+            self._facets = FacetIndex.load(facets_dir)
+
+        self._load_settings(generation_dir)
+        self._mask_unusable(metadata.column("embedding_text"))
+        self._load_full_vectors(os.path.join(generation_dir, "vectors.npy"))
+
+    def _load_lexical(self, lexical_dir, metadata, mmap):
+        if os.path.exists(lexical_dir):
+            self.lexical = LexicalIndex.load(lexical_dir, mmap=mmap)
+            if self.lexical.n_docs == self.index.ntotal:
+                return
+
+        # Generations saved before the lexical index existed
+        print("🔤 Building lexical index from stored metadata...")
+        self.lexical = LexicalIndex.build(t or "" for t in metadata.column("embedding_text"))
+
+    def _load_full_vectors(self, path):
+        self.full_vectors = None
+        if not self.index_params.get("rescore"):
+            return
+
+        if os.path.exists(path):
+            self.full_vectors = FullPrecisionVectors.load(path)
+            if len(self.full_vectors) == self.index.ntotal:
+                return
+
+        stored_type = stored_index_type(self.index)
+        if stored_type == "flat":
+            # Not quantized yet (too small to train): the index holds exact vectors
+            self.full_vectors = FullPrecisionVectors(self.dim, all_vectors(self.index))
+        elif stored_type == "binary":
+            # Hamming distances would be read as cosine similarities by
+            # score_threshold and the fusion
+            raise RuntimeError(
+                f"Binary index at {self.index_path} has no matching vectors.npy to re-score with; "
+                "delete the store and ingest its files again"
+            )
+        else:
+            # sq8/fp16 scores are approximate inner products, still usable as cosines
+            self.full_vectors = None
+            print("⚠️ No full-precision vectors to re-score with; using the quantized scores")
+
+    def facets(self):
+        if self._facets is None or self._facets.n_rows != len(self.metadata):
+            self._facets = FacetIndex.build(self.metadata)
+        return self._facets
+
+    def _load_settings(self, directory):
+        meta_file = os.path.join(directory, "index_meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.index_type = meta["configured_type"]
+            self.index_params = resolve_index_params(self.index_type, meta["index_params"])
+            self.pruned = meta.get("pruned", False)
+        else:
+            self.index_type = stored_index_type(self.index)
+            self.index_params = resolve_index_params(self.index_type)
+            self.pruned = False
+
+        manifest_file = os.path.join(directory, "manifest.json")
+        if os.path.exists(manifest_file):
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                self.file_manifest = json.load(f)
 
     # SEARCH
-    def search(self, query, top_k=5):
-        query_embedding = self.embed_batch([query])
-        scores, indices = self.index.search(query_embedding, top_k)
+    def embed_queries(self, queries):
+        """
+        (len(queries), dim) unit-length query embeddings: cached ones from
+        the embedding cache, the rest in one embed request.
+        """
+        # Normalized like the indexed chunks, so repeats share a cache entry
+        texts = [self.normalize_for_embedding(q) or q for q in queries]
+        embeddings, kept = self.embed_texts(texts)
+        if len(kept) < len(texts):
+            raise RuntimeError(f"Query embedding failed for {len(texts) - len(kept)} queries")
+        return embeddings
+
+    def embed_query(self, query):
+        """(1, dim) unit-length query embedding, served from the embedding cache on repeats."""
+        return self.embed_queries([query])
+
+    def _vectors(self, ids):
+        """Stored vectors of ids: the full-precision copy when there is one."""
+        if self.full_vectors is not None:
+            return self.full_vectors.get(ids)
+        return stored_vectors(self.index, ids)
+
+    def _dense_search(self, query_embeddings, k, nprobe=None, ef_search=None, allowed=None):
+        """
+        Per query row: [(vector id, cosine)] best first, restricted to
+        allowed rows when given.
+        """
+        stored_type = stored_index_type(self.index)
+
+        if allowed is not None and stored_type != "flat":
+            ids = np.flatnonzero(allowed)
+            if len(ids) <= EXACT_FILTER_MAX:
+                # Few rows: exact scores, no chance of the ANN search missing them
+                scores = query_embeddings @ self._vectors(ids).T
+                best = np.argsort(-scores, axis=1)[:, :k]
+                return [
+                    [(int(ids[i]), float(row[i])) for i in order]
+                    for row, order in zip(scores, best)
+                ]
+
+        # A quantized index only shortlists candidates for exact re-scoring
+        fetch = k * self.index_params["rescore_factor"] if self.full_vectors is not None else k
+
+        if stored_type == "binary" and allowed is not None:
+            # IndexLSH takes no search parameters (no ID selector): scan
+            # deeper by the filter's selectivity and drop other rows after
+            fetch = min(self.index.ntotal, math.ceil(fetch / max(float(np.mean(allowed)), 1e-6)))
+            params = None
+        else:
+            params = search_params(self.index, nprobe, ef_search, allowed)
+
+        scores, indices = self.index.search(query_embeddings, min(fetch, self.index.ntotal) or 1, params=params)
+        hits = [
+            [(int(idx), float(score)) for idx, score in zip(row_ids, row_scores)
+             if idx != -1 and (allowed is None or allowed[idx])]
+            for row_ids, row_scores in zip(indices, scores)
+        ]
+
+        if self.full_vectors is not None:
+            return [
+                rescore(query_embedding, [idx for idx, _ in row_hits], self.full_vectors, k)
+                for query_embedding, row_hits in zip(query_embeddings, hits)
+            ]
+        return [row_hits[:k] for row_hits in hits]
+
+    def _paragraph_id(self, idx):
+        if isinstance(self.metadata, ColumnarMetadata):
+            if "paragraph_id" not in self.metadata.columns:
+                return None
+            return self.metadata.value(idx, "paragraph_id")
+        return self.metadata[idx].get("paragraph_id")
+
+    def _distinct(self, hits):
+        """Best (first) of the (vector id, score) hits of each paragraph."""
+        seen = set()
+        kept = []
+        for idx, score in hits:
+            key = self._paragraph_id(idx) or idx
+            if key not in seen:
+                seen.add(key)
+                kept.append((idx, score))
+        return kept
+
+    def _deepening_search(self, query_embeddings, k, min_hits, score_threshold=None, distinct=False,
+                          nprobe=None, ef_search=None, allowed=None):
+        """
+        _dense_search() keeping only hits >= score_threshold, and with
+        distinct only the best hit of each paragraph (sentences of one
+        paragraph end up as one RAG passage). Queries with fewer than
+        min_hits such hits are searched again with twice as many
+        neighbours, until they have enough, their last neighbour falls
+        below the threshold (nothing further can pass) or every row has
+        been seen. Returns the hits and the neighbours fetched per query.
+        """
+        if score_threshold is None:
+            score_threshold = -np.inf
+
+        limit = int(np.count_nonzero(allowed)) if allowed is not None else self.index.ntotal
+        k = min(k, limit) or 1
+        hits = self._dense_search(query_embeddings, k, nprobe, ef_search, allowed)
+        scanned = [k] * len(hits)
+
+        def usable(row_hits):
+            passing = [(idx, score) for idx, score in row_hits if score >= score_threshold]
+            return self._distinct(passing) if distinct else passing
+
+        def needs_more(row_hits, depth):
+            return (len(row_hits) == depth and depth < limit and row_hits[-1][1] >= score_threshold
+                    and len(usable(row_hits)) < min_hits)
+
+        pending = [i for i, row_hits in enumerate(hits) if needs_more(row_hits, k)]
+        while pending:
+            k = min(k * 2, limit)
+            deeper = self._dense_search(query_embeddings[pending], k, nprobe, ef_search, allowed)
+            for i, row_hits in zip(pending, deeper):
+                hits[i], scanned[i] = row_hits, k
+            pending = [i for i in pending if needs_more(hits[i], k)]
+
+        return [usable(row_hits) for row_hits in hits], scanned
+
+    def _fuse(self, query, query_embedding, dense, top_k, n_candidates, allowed,
+              score_threshold=None, distinct=False, keyword_rescue=None):
+        """
+        Reciprocal rank fusion of one query's dense hits with its BM25 hits.
+        With score_threshold, dense holds only passing hits and keyword-only
+        matches must pass the same cosine threshold, unless keyword_rescue
+        is set and their BM25 score is at least keyword_rescue.
+        """
+        cosine = dict(dense)
+
+        def add_cosine(ids):
+            # Keyword-only matches still need their cosine similarity
+            missing = [idx for idx in ids if idx not in cosine]
+            if missing:
+                vectors = self._vectors(missing)
+                cosine.update(zip(missing, (vectors @ query_embedding).tolist()))
+
+        lexical_hits = self.lexical.search(query, n_candidates, allowed)
+        lexical_rank = {idx: rank for rank, (idx, _) in enumerate(lexical_hits)}
+        lexical_score = dict(lexical_hits)
+
+        fused = {}
+        for ranking in (dense, lexical_hits):
+            for rank, (idx, _) in enumerate(ranking):
+                fused[idx] = fused.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        if score_threshold is not None:
+            add_cosine(fused)
+            fused = {
+                idx: score for idx, score in fused.items()
+                if cosine[idx] >= score_threshold
+                or (keyword_rescue is not None and lexical_score.get(idx, 0.0) >= keyword_rescue)
+            }
+
+        ranked = [(idx, fused[idx]) for idx in sorted(fused, key=fused.get, reverse=True)]
+        if distinct:
+            ranked = self._distinct(ranked)
+        top = [idx for idx, _ in ranked[:top_k]]
+        add_cosine(top)
 
         results = []
-        for idx, score in zip(indices[0], scores[0]):
-            if idx == -1:
-                continue
-            record = self.metadata[idx].copy()
-            record["score"] = float(score)
+        for idx in top:
+            record = self._result(idx, cosine[idx])
+            record["rrf_score"] = round(fused[idx], 6)
+            if idx in lexical_rank:
+                record["lexical_rank"] = lexical_rank[idx]
             results.append(record)
 
         return results
 
-    def search_vector_db(self, query: str, top_k: int = 5,score_threshold: float = 0.25):
-        # Load vector database
-        db = BGEVectorStore(index_path="src/vector_db")
-        db.load()
+    def search(self, query, top_k=5, nprobe=None, ef_search=None, lexical=True,
+               source_type=None, source_name=None, pages=None, score_threshold=None,
+               distinct_paragraphs=False, stats=None, keyword_rescue=None):
+        """
+        nprobe (IVF) and ef_search (HNSW) override the index defaults for
+        this query only; they trade latency for recall. Each result carries
+        its vector_id, stable until the next saved generation.
+
+        With lexical=True the dense and BM25 rankings are fused with
+        reciprocal rank fusion, so exact terms (function names, error
+        codes) are found even when their embedding is not close. Results
+        are in fused order and carry rrf_score and, for keyword matches,
+        lexical_rank; "score" stays the cosine similarity.
 
-        # Perform semantic search
-        results = db.search(query, top_k=top_k)
+        source_type, source_name (a value or a list) and pages (a page or
+        an inclusive (first, last) range) restrict the search itself to
+        matching rows, so top_k results come back however narrow the filter.
 
-        # Filter weak matches
-        filtered_results = [
-            r for r in results
-            if r["score"] >= score_threshold
-        ]
+        score_threshold: only results with at least this cosine similarity
+        are returned, keyword matches included, and the index is searched
+        deeper until top_k of them are found or none remain.
+        keyword_rescue: opt-in BM25 score; keyword matches scoring at least
+        this much are returned even below score_threshold (e.g. an error
+        code whose embedding is not close to the question). Off by default.
+        distinct_paragraphs: at most one result per paragraph, again
+        searching deeper until there are top_k.
+        stats: optional dict, filled with the number of candidates scanned.
+        """
+        return self.search_many(
+            [query], top_k, nprobe=nprobe, ef_search=ef_search, lexical=lexical,
+            source_type=source_type, source_name=source_name, pages=pages,
+            score_threshold=score_threshold, distinct_paragraphs=distinct_paragraphs, stats=stats,
+            keyword_rescue=keyword_rescue
+        )[0]
+
+    def search_many(self, queries, top_k=5, batch_size=64, nprobe=None, ef_search=None,
+                    lexical=True, source_type=None, source_name=None, pages=None,
+                    score_threshold=None, distinct_paragraphs=False, stats=None,
+                    keyword_rescue=None):
+        """
+        search() for a list of queries, one result list per query in the
+        same order. Each batch of batch_size queries is embedded in one
+        request and searched with one index.search call, which FAISS
+        spreads over its threads; for evaluation runs and query expansion.
+        """
+        self._flush_removals()
+        if stats is not None:
+            stats.update({"queries": len(queries), "candidates_scanned": 0, "deepened": 0})
+
+        allowed = self.facets().mask(source_type, source_name, pages)
+        if self._unusable is not None:
+            allowed = ~self._unusable if allowed is None else allowed & ~self._unusable
+        if allowed is not None and not allowed.any():
+            return [[] for _ in queries]
+
+        n_candidates = max(top_k * 4, RRF_CANDIDATES) if lexical else top_k
+        results = []
 
-        return filtered_results
+        for start in range(0, len(queries), batch_size):
+            batch = list(queries[start:start + batch_size])
+            query_embeddings = self.embed_queries(batch)
+
+            if score_threshold is None and not distinct_paragraphs:
+                dense = self._dense_search(query_embeddings, n_candidates, nprobe, ef_search, allowed)
+                scanned = [n_candidates] * len(batch)
+            else:
+                dense, scanned = self._deepening_search(
+                    query_embeddings, n_candidates, top_k, score_threshold, distinct_paragraphs,
+                    nprobe, ef_search, allowed
+                )
+
+            if stats is not None:
+                stats["candidates_scanned"] += sum(scanned)
+                stats["deepened"] += sum(1 for n in scanned if n > n_candidates)
+
+            for query, query_embedding, hits in zip(batch, query_embeddings, dense):
+                if lexical:
+                    results.append(self._fuse(
+                        query, query_embedding, hits, top_k, n_candidates, allowed,
+                        score_threshold, distinct_paragraphs, keyword_rescue
+                    ))
+                else:
+                    results.append([self._result(idx, score) for idx, score in hits[:top_k]])
+
+        return results
+
+    def _result(self, idx, score):
+        record = self.metadata[idx].copy()
+        record["score"] = float(score)
+        record["vector_id"] = int(idx)
+        return record
+
+    def resident(self):
+        """Shared resident store for this index_path, reloaded only when the files on disk change."""
+        return get_vector_store(self.index_path, self.model_name, self.dim)
+
+    def search_vector_db(self, query: str, top_k: int = 5,score_threshold: float = 0.25, **filters):
+        """filters: source_type, source_name and/or pages, see search()."""
+        db = self.resident()
+
+        # Hybrid (dense + keyword) search that only returns matches above
+        # score_threshold (keyword matches included), one per paragraph, searching deeper until it has
+        # top_k of them
+        stats = {}
+        results = db.search(
+            query, top_k=top_k, score_threshold=score_threshold, distinct_paragraphs=True,
+            stats=stats, **filters
+        )
+        print(f"🔎 {len(results)} matches from {stats['candidates_scanned']} candidates")
+
+        return results
 
 
 # #  RUN
@@ -227,4 +1344,12 @@ class BGEVectorStore:
 # print(chunks)
 # vector_db = BGEVectorStore(model_name="bge-m3", dim=1024, index_path="src/vector_db")
 # vector_db.add_documents(chunks, batch_size=32)
-# vector_db.save()
\ No newline at end of file
+# vector_db.save()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python vector_database.py migrate [index_path]
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        migrate_legacy_store(*sys.argv[2:3])